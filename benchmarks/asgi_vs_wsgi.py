@@ -0,0 +1,142 @@
+"""
+Load-test comparison of the two serving modes on a single core:
+
+    WSGI  gunicorn wsgi --chdir src      (one sync worker)
+    ASGI  uvicorn asgi:application       (one worker, async engine)
+
+Both servers are pinned to the same CPU core and driven by an asyncio HTTP
+client from the remaining cores, at every concurrency level given.
+
+    python benchmarks/asgi_vs_wsgi.py --concurrency 1 16 64 256 --duration 10
+
+Prints requests/sec, p50 and p99 latency and error counts as JSON. The
+response cache is disabled on the servers (CACHE_BACKEND=none) so every
+request reaches the database. The mix includes routes without an async
+handler (FALLBACK_PATHS), which uvicorn hands to the Flask app on its
+thread pool (ASGI_WSGI_THREADS).
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+from seed import seed
+
+# Rutas que en ASGI sirve Flask, no un handler async
+FALLBACK_PATHS = ["/leaderboard/people?limit=20", "/users/1/favorites"]
+PATHS = ["/people?limit=50", "/planets?limit=50", "/people/1", "/users/1", "/users?limit=20"] + FALLBACK_PATHS
+
+SERVERS = {
+    "wsgi": ["gunicorn", "wsgi", "--chdir", os.path.join(ROOT, "src"), "--workers", "1"],
+    "asgi": ["uvicorn", "asgi:application", "--app-dir", os.path.join(ROOT, "src"), "--workers", "1",
+             "--log-level", "warning"],
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(name, url, port, core):
+    env = dict(os.environ, DATABASE_URL=url, CACHE_BACKEND="none")
+    command = SERVERS[name] + (["--bind", "127.0.0.1:%d" % port] if name == "wsgi" else ["--port", str(port)])
+
+    def pin():
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, {core})
+
+    process = subprocess.Popen(command, env=env, preexec_fn=pin,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("%s did not start" % name)
+
+
+async def fetch(port, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(("GET %s HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n" % path).encode())
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    return data[9:12] == b"200"
+
+
+async def drive(port, concurrency, duration):
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def client(number):
+        nonlocal errors
+        i = number
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                ok = await fetch(port, PATHS[i % len(PATHS)])
+            except OSError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+            i += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[client(n) for n in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    pick = lambda q: round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 2)
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": pick(0.50),
+        "p99_ms": pick(0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64, 256])
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--core", type=int, default=0, help="CPU core the server is pinned to")
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    url = args.database_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    seed(url, args.rows)
+
+    # El generador de carga corre fuera del núcleo del servidor
+    if hasattr(os, "sched_setaffinity") and len(os.sched_getaffinity(0)) > 1:
+        os.sched_setaffinity(0, os.sched_getaffinity(0) - {args.core})
+
+    results = {"rows": args.rows, "paths": PATHS}
+    for name in SERVERS:
+        port = free_port()
+        process = start_server(name, url, port, args.core)
+        try:
+            results[name] = [asyncio.run(drive(port, c, args.duration)) for c in args.concurrency]
+        finally:
+            process.terminate()
+            process.wait()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+CPU cost against bytes saved for each response encoding and level, on the
+largest catalog payloads.
+
+    python benchmarks/compression.py --rows 10000 --repeat 20
+
+For every payload (a full page of /people, /planets, /users and
+/users/favorites) and every installed encoding, reports the compressed
+size, the share of bytes saved and the best time to compress it, next to
+the time to read already compressed bytes from the response cache (what
+a repeated request for the same version pays). Prints JSON.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+from seed import seed
+
+PAYLOADS = ("/people?limit=200", "/planets?limit=200", "/users?limit=200", "/users/favorites?limit=200")
+LEVELS = {"gzip": (1, 6, 9), "br": (1, 4, 11), "zstd": (1, 3, 19)}
+
+
+def best_time(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    url = args.database_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    seed(url, args.rows)
+    os.environ["DATABASE_URL"] = url
+    os.environ["COMPRESSION"] = "0"
+
+    from app import create_app
+    from cache import MemoryCache
+    from compress import COMPRESSOR_FACTORIES
+
+    client = create_app(admin=False, migrate=False).test_client()
+    cache = MemoryCache()
+    results = {"rows": args.rows, "payloads": {}}
+    for path in PAYLOADS:
+        body = client.get(path).get_data()
+        payload = results["payloads"][path] = {"bytes": len(body), "encodings": {}}
+        for encoding, levels in LEVELS.items():
+            for level in levels:
+                try:
+                    compress = COMPRESSOR_FACTORIES[encoding](level)
+                except ImportError:
+                    continue
+                compressed = compress(body)
+                seconds = best_time(lambda: compress(body), args.repeat)
+                payload["encodings"]["%s-%d" % (encoding, level)] = {
+                    "bytes": len(compressed),
+                    "saved": round(1 - len(compressed) / len(body), 3),
+                    "compress_ms": round(seconds * 1000, 3),
+                    "mb_per_sec": round(len(body) / seconds / 1e6, 1),
+                }
+
+        # Bytes ya comprimidos servidos desde la caché en memoria
+        cache.set(path, compressed)
+        payload["cached_read_ms"] = round(best_time(lambda: cache.get(path), args.repeat) * 1000, 4)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
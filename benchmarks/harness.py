@@ -0,0 +1,332 @@
+"""
+Benchmark harness for every route in src/app.py.
+
+Seeds the schema at the chosen scale, serves the app with gunicorn (through
+benchmarks/serve.py, which reports the SQL statements run per request) and
+drives each route with a local HTTP load generator. Records throughput,
+p50/p95/p99 latency, queries per request and the server's peak RSS, and
+writes everything as JSON so runs can be diffed between commits.
+
+    python benchmarks/harness.py --scale 100k --duration 10 --concurrency 16
+    python benchmarks/harness.py --compare results/old.json results/new.json
+
+Read routes run under load for --duration seconds each. Heavy routes (full
+exports) and routes that write run a fixed number of requests, in the order
+of SCENARIOS, so creates happen before the updates and deletes that use them.
+"""
+import argparse
+import datetime
+import http.client
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+from seed import SCALES, seed
+from utils import encode_cursor
+
+BULK_SIZE = 50
+RUN = uuid.uuid4().hex[:8]
+
+# /metrics y /internal/pool exigen el token (ver utils.internal_only)
+INTERNAL_TOKEN = uuid.uuid4().hex
+INTERNAL_HEADERS = {"Authorization": "Bearer %s" % INTERNAL_TOKEN}
+
+
+def page(path, i, rows, size=50):
+    after = (i * size) % rows
+    return path + "?limit=%d" % size + ("&after=%s" % encode_cursor(after) if after else "")
+
+
+def ids(path, i, rows, size=50):
+    # Ids dispersos, como los de una lista de favoritos
+    return path + "?ids=" + ",".join(str((i * size + n * 7919) % rows + 1) for n in range(size))
+
+
+# endpoint: (kind, scenario(i, rows, writes) -> (method, path, body))
+SCENARIOS = {
+    # Lecturas
+    "sitemap": ("read", lambda i, r, w: ("GET", "/", None)),
+    "get_pool_metrics": ("read", lambda i, r, w: ("GET", "/internal/pool", None)),
+    "get_metrics": ("read", lambda i, r, w: ("GET", "/metrics", None)),
+    "get_users": ("read", lambda i, r, w: ("GET", ids("/users", i, r) if i % 2 else page("/users", i, r), None)),
+    "get_user": ("read", lambda i, r, w: ("GET", "/users/%d" % (i % r + 1), None)),
+    "get_profiles": ("read", lambda i, r, w: ("GET", page("/profiles", i, r), None)),
+    "get_profile": ("read", lambda i, r, w: ("GET", "/profiles/%d" % (i % r + 1), None)),
+    "get_people": ("read", lambda i, r, w: ("GET", ids("/people", i, r) if i % 3 == 2 else page("/people", i, r) + ("&name_prefix=person-%d" % (i % 100) if i % 3 else ""), None)),
+    "get_person": ("read", lambda i, r, w: ("GET", "/people/%d" % (i % r + 1), None)),
+    "get_planets": ("read", lambda i, r, w: ("GET", ids("/planets", i, r) if i % 2 else page("/planets", i, r), None)),
+    "get_planet": ("read", lambda i, r, w: ("GET", "/planets/%d" % (i % r + 1), None)),
+    "get_users_with_favorites": ("read", lambda i, r, w: ("GET", page("/users/favorites", i, r), None)),
+    "get_user_favorites": ("read", lambda i, r, w: ("GET", "/users/%d/favorites" % (i % r + 1), None)),
+    "is_user_favorite": ("read", lambda i, r, w: ("GET", "/users/%d/favorites/%s/%d" % (i % r + 1, ("people", "planets")[i % 2], i % r + 1), None)),
+    "get_people_leaderboard": ("read", lambda i, r, w: ("GET", "/leaderboard/people?limit=20", None)),
+    "get_planets_leaderboard": ("read", lambda i, r, w: ("GET", "/leaderboard/planets?limit=20", None)),
+    "search_names": ("read", lambda i, r, w: ("GET", "/search?q=%s" % ("person-%d" % (i % r))[:8 + i % 4], None)),
+    "export_collection": ("heavy", lambda i, r, w: ("GET", "/export/" + ("people", "planets", "users")[i % 3], None)),
+
+    # Altas
+    "create_user": ("write", lambda i, r, w: ("POST", "/users", {"email": "bench-%s-%d@example.com" % (RUN, i), "password": "x"})),
+    "login": ("write", lambda i, r, w: ("POST", "/login", {"email": "bench-%s-%d@example.com" % (RUN, i), "password": "x"})),
+    "create_profile": ("write", lambda i, r, w: ("POST", "/profiles/%d" % (r + 1 + i), {"bio": "bench"})),
+    "create_person": ("write", lambda i, r, w: ("POST", "/people/", {"name": "bench-%s-%d" % (RUN, i)})),
+    "create_planet": ("write", lambda i, r, w: ("POST", "/planets", {"name": "bench-%s-%d" % (RUN, i)})),
+    "add__favorite_planet": ("write", lambda i, r, w: ("POST", "/favorite/planet/%d" % (i % r + 1), {"user_id": 2 * (i % (r // 2)) + 2})),
+    "add_favorite_person": ("write", lambda i, r, w: ("POST", "/favorite/people/%d" % (i % r + 1), {"user_id": 2 * (i % (r // 2)) + 2})),
+    "put_favorite_planet": ("write", lambda i, r, w: ("PUT", "/favorite/planet/%d" % (i % r + 1), {"user_id": 2 * (i % (r // 2)) + 2})),
+    "put_favorite_person": ("write", lambda i, r, w: ("PUT", "/favorite/people/%d" % (i % r + 1), {"user_id": 2 * (i % (r // 2)) + 2})),
+    "create_people_bulk": ("write", lambda i, r, w: ("POST", "/people/bulk", [{"name": "bulk-%s-%d-%d" % (RUN, i, n)} for n in range(BULK_SIZE)])),
+    "create_planets_bulk": ("write", lambda i, r, w: ("POST", "/planets/bulk", [{"name": "bulk-%s-%d-%d" % (RUN, i, n)} for n in range(BULK_SIZE)])),
+    "create_favorites_bulk": ("write", lambda i, r, w: ("POST", "/favorites/bulk", [{"user_id": 2 * ((i * BULK_SIZE + n) % (r // 2)) + 2, "planet_id": (i * BULK_SIZE + n + r // 2) % r + 1} for n in range(BULK_SIZE)])),
+
+    # Modificaciones
+    "update_user": ("write", lambda i, r, w: ("PUT", "/users/%d" % (i % r + 1), {"email": "user-%d@example.com" % (i % r), "password": "y"})),
+    "update_profile": ("write", lambda i, r, w: ("PUT", "/profiles/%d" % (i % r + 1), {"bio": "updated %d" % i})),
+    "update_person": ("write", lambda i, r, w: ("PUT", "/people/%d" % (i % r + 1), {"name": "person-%d-%s" % (i % r, RUN)})),
+    "update_planet": ("write", lambda i, r, w: ("PUT", "/planet/%d" % (i % r + 1), {"name": "planet-%d-%s" % (i % r, RUN)})),
+    "update_people_bulk": ("write", lambda i, r, w: ("PUT", "/people/bulk", [{"id": (i * BULK_SIZE + n) % r + 1, "name": "bulk-person-%d-%s" % ((i * BULK_SIZE + n) % r, RUN)} for n in range(BULK_SIZE)])),
+    "update_planets_bulk": ("write", lambda i, r, w: ("PUT", "/planets/bulk", [{"id": (i * BULK_SIZE + n) % r + 1, "name": "bulk-planet-%d-%s" % ((i * BULK_SIZE + n) % r, RUN)} for n in range(BULK_SIZE)])),
+
+    # Bajas: cada escenario usa su propio rango de ids
+    "delete_favorite_planet": ("write", lambda i, r, w: ("DELETE", "/favorite/planet/%d" % (2 * (i % (r // 2)) + 2), None)),
+    "delete_favorite_people": ("write", lambda i, r, w: ("DELETE", "/favorite/people/%d" % (2 * (i % (r // 2)) + 1), None)),
+    "delete_favorites_bulk": ("write", lambda i, r, w: ("DELETE", "/favorites/bulk", [(r // 2 + i * BULK_SIZE + n) % r + 1 for n in range(BULK_SIZE)])),
+    "delete_profile": ("write", lambda i, r, w: ("DELETE", "/profileseee/%d" % (r + 1 + i), None)),
+    "delete_user": ("write", lambda i, r, w: ("DELETE", "/users/%d" % (r + 1 + i), None)),
+    "delete_person": ("write", lambda i, r, w: ("DELETE", "/people/%d" % (r - i), None)),
+    "delete_planet": ("write", lambda i, r, w: ("DELETE", "/planets/%d" % (r - i), None)),
+    "delete_people_bulk": ("write", lambda i, r, w: ("DELETE", "/people/bulk", [r - w - i * BULK_SIZE - n for n in range(BULK_SIZE)])),
+    "delete_users_bulk": ("write", lambda i, r, w: ("DELETE", "/users/bulk", [r - w - i * BULK_SIZE - n for n in range(BULK_SIZE)])),
+    "delete_planets_bulk": ("write", lambda i, r, w: ("DELETE", "/planets/bulk", [r - w - i * BULK_SIZE - n for n in range(BULK_SIZE)])),
+}
+
+
+def app_endpoints():
+    from app import create_app
+    app = create_app(admin=False, migrate=False)
+    endpoints = (rule.endpoint.removeprefix("api.") for rule in app.url_map.iter_rules())
+    return sorted({endpoint for endpoint in endpoints if endpoint != "static" and "." not in endpoint})
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(url, port, workers, threads, cache):
+    env = dict(os.environ, DATABASE_URL=url, WEB_CONCURRENCY=str(workers), INTERNAL_TOKEN=INTERNAL_TOKEN)
+    if not cache:
+        env["CACHE_BACKEND"] = "none"
+    process = subprocess.Popen(
+        ["gunicorn", "serve:application", "--chdir", HERE, "--bind", "127.0.0.1:%d" % port,
+         "--workers", str(workers), "--threads", str(threads), "--timeout", "300"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    # gunicorn abre el puerto antes de que el worker cargue la app: se espera
+    # a la primera respuesta para no medir el arranque
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            conn.request("GET", "/internal/pool", headers=INTERNAL_HEADERS)
+            if conn.getresponse().status == 200:
+                conn.close()
+                return process
+        except (http.client.HTTPException, OSError):
+            pass
+        time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("gunicorn did not start")
+
+
+class Client(threading.local):
+    def __init__(self, port, accept_encoding=None):
+        self.port = port
+        self.accept_encoding = accept_encoding
+        self.conn = None
+
+    def request(self, method, path, body):
+        payload = json.dumps(body) if body is not None else None
+        headers = dict(INTERNAL_HEADERS)
+        if payload is not None:
+            headers["Content-Type"] = "application/json"
+        if self.accept_encoding:
+            headers["Accept-Encoding"] = self.accept_encoding
+        for attempt in (0, 1):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=300)
+            try:
+                self.conn.request(method, path, body=payload, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                return response.status, len(data), int(response.getheader("X-Query-Count", 0))
+            except (http.client.HTTPException, OSError):
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+
+def percentile(values, q):
+    return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 2) if values else None
+
+
+def run_scenario(client, scenario, rows, writes, concurrency, duration=None, requests=None):
+    samples = []
+    lock = threading.Lock()
+    counter = iter(range(10 ** 12))
+    deadline = time.perf_counter() + duration if duration else None
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter)
+            if (deadline and time.perf_counter() >= deadline) or (requests is not None and i >= requests):
+                return
+            method, path, body = scenario(i, rows, writes)
+            started = time.perf_counter()
+            try:
+                status, size, queries = client.request(method, path, body)
+            except (http.client.HTTPException, OSError):
+                status, size, queries = 0, 0, 0
+            samples.append((time.perf_counter() - started, status, size, queries))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(sample[0] for sample in samples)
+    statuses = {}
+    for sample in samples:
+        statuses[str(sample[1])] = statuses.get(str(sample[1]), 0) + 1
+    count = len(samples) or 1
+    return {
+        "method": scenario(0, rows, writes)[0],
+        "path": scenario(0, rows, writes)[1],
+        "requests": len(samples),
+        "statuses": statuses,
+        "requests_per_sec": round(len(samples) / elapsed, 1),
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "queries_per_request": round(sum(sample[3] for sample in samples) / count, 2),
+        "bytes_per_response": round(sum(sample[2] for sample in samples) / count),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(old_path, new_path):
+    with open(old_path) as old_file, open(new_path) as new_file:
+        old, new = json.load(old_file), json.load(new_file)
+    print("%-28s %12s %12s %9s %9s %9s" % ("endpoint", "rps old", "rps new", "p99 old", "p99 new", "queries"))
+    for endpoint, result in new["routes"].items():
+        before = old["routes"].get(endpoint)
+        if before is None:
+            continue
+        print("%-28s %12s %12s %9s %9s %4s->%-4s" % (
+            endpoint, before["requests_per_sec"], result["requests_per_sec"],
+            before["p99_ms"], result["p99_ms"], before["queries_per_request"], result["queries_per_request"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", choices=SCALES, default="1k")
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    parser.add_argument("--duration", type=float, default=5, help="seconds per read route")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--write-requests", type=int, default=100, help="requests per write route")
+    parser.add_argument("--heavy-requests", type=int, default=3, help="requests per heavy route")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--cache", action="store_true", help="keep the response cache enabled")
+    parser.add_argument("--only", nargs="+", help="run only these endpoints")
+    parser.add_argument("--accept-encoding", default=None, help="e.g. gzip; sizes are then compressed bytes")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args()
+
+    if args.compare:
+        return compare(*args.compare)
+
+    missing = set(app_endpoints()) - set(SCENARIOS)
+    if missing:
+        print("warning: no scenario for %s" % ", ".join(sorted(missing)), file=sys.stderr)
+
+    rows = SCALES[args.scale]
+    url = args.database_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    seeded = time.perf_counter()
+    seed(url, rows)
+    seeded = time.perf_counter() - seeded
+
+    port = free_port()
+    server = start_server(url, port, args.workers, args.threads, args.cache)
+    client = Client(port, args.accept_encoding)
+    results = {}
+    try:
+        for endpoint, (kind, scenario) in SCENARIOS.items():
+            if args.only and endpoint not in args.only:
+                continue
+            if kind == "read":
+                options = {"duration": args.duration}
+            else:
+                options = {"requests": args.heavy_requests if kind == "heavy" else args.write_requests}
+            concurrency = 1 if kind == "heavy" else args.concurrency
+            results[endpoint] = dict(kind=kind, **run_scenario(
+                client, scenario, rows, args.write_requests, concurrency, **options))
+            print("%-28s %8s req/s  p99 %8s ms  %s queries" % (
+                endpoint, results[endpoint]["requests_per_sec"], results[endpoint]["p99_ms"],
+                results[endpoint]["queries_per_request"]), file=sys.stderr)
+    finally:
+        server.terminate()
+        server.wait()
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "scale": args.scale,
+            "rows": rows,
+            "database": url.split(":", 1)[0],
+            "seed_seconds": round(seeded, 1),
+            "concurrency": args.concurrency,
+            "accept_encoding": args.accept_encoding,
+            "duration": args.duration,
+            "workers": args.workers,
+            "threads": args.threads,
+            "cache": args.cache,
+            "python": platform.python_version(),
+        },
+        # ru_maxrss de los hijos ya terminados: el mayor entre master y workers
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+                             / (1024 * 1024 if sys.platform == "darwin" else 1024), 1),
+        "routes": results,
+    }
+
+    output = args.output or os.path.join(HERE, "results", "%s-%s.json" % (report["meta"]["commit"], args.scale))
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Insert throughput on the people table: the old duplicate check (SELECT by
+name, then INSERT, no index) against the unique index on people.name
+(INSERT, catch IntegrityError).
+
+    python benchmarks/name_uniqueness.py --rows 1000000 --inserts 500
+
+Prints a JSON document with inserts/sec for both strategies.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from sqlalchemy import MetaData, create_engine, insert, select, text
+from sqlalchemy.exc import IntegrityError
+from models import People
+
+SEED_CHUNK = 50000
+
+
+def build_table(engine, rows, with_index):
+    table = People.__table__.to_metadata(MetaData())
+    table.metadata.drop_all(engine)
+    table.metadata.create_all(engine)
+    if not with_index:
+        with engine.begin() as conn:
+            conn.execute(text("DROP INDEX ix_people_name"))
+
+    with engine.begin() as conn:
+        for start in range(0, rows, SEED_CHUNK):
+            end = min(start + SEED_CHUNK, rows)
+            conn.execute(insert(table), [{"name": f"seed-{i}"} for i in range(start, end)])
+    return table
+
+
+def names_to_insert(rows, inserts):
+    # Una de cada diez inserciones es un duplicado de una fila existente
+    return [f"seed-{i * 7 % rows}" if i % 10 == 0 else f"new-{i}" for i in range(inserts)]
+
+
+def select_then_insert(engine, table, names):
+    for name in names:
+        with engine.begin() as conn:
+            exists = conn.execute(select(table.c.id).where(table.c.name == name)).first()
+            if not exists:
+                conn.execute(insert(table).values(name=name))
+
+
+def insert_or_conflict(engine, table, names):
+    for name in names:
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(table).values(name=name))
+        except IntegrityError:
+            pass
+
+
+def run(engine, rows, inserts, with_index, strategy):
+    table = build_table(engine, rows, with_index)
+    names = names_to_insert(rows, inserts)
+    started = time.perf_counter()
+    strategy(engine, table, names)
+    elapsed = time.perf_counter() - started
+    return {"seconds": round(elapsed, 3), "inserts_per_sec": round(inserts / elapsed, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--inserts", type=int, default=500)
+    parser.add_argument("--database-url", default=None,
+                        help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    url = args.database_url
+    if url is None:
+        url = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(url)
+
+    result = {
+        "rows": args.rows,
+        "inserts": args.inserts,
+        "dialect": engine.dialect.name,
+        "before": run(engine, args.rows, args.inserts, False, select_then_insert),
+        "after": run(engine, args.rows, args.inserts, True, insert_or_conflict),
+    }
+    result["speedup"] = round(result["after"]["inserts_per_sec"] / result["before"]["inserts_per_sec"], 1)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Signup and login throughput at several scrypt costs, with the latency of a
+cheap request (GET /people/<id>) served while the hashing runs.
+
+    python benchmarks/passwords.py --costs 12,14,15 --requests 64 --concurrency 8
+
+Each cost is log2 of PASSWORD_SCRYPT_N. Signups (POST /users) and logins
+(POST /login) go through the Flask test client from --concurrency threads,
+so hashing is bounded by --workers (PASSWORD_HASH_WORKERS). Prints JSON.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+from seed import seed
+
+
+def run(app, requests, concurrency, make_request):
+    """
+    Requests per second for `requests` calls of make_request(client, i).
+    """
+    local = threading.local()
+
+    def call(i):
+        if not hasattr(local, "client"):
+            local.client = app.test_client()
+        response = make_request(local.client, i)
+        if response.status_code >= 400:
+            raise RuntimeError("%s: %s" % (response.status_code, response.get_data(as_text=True)))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, range(requests)))
+    return requests / (time.perf_counter() - started)
+
+
+def probe_latency(app, stop):
+    # GET barato en paralelo: cuánto espera mientras se calculan hashes
+    client = app.test_client()
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        client.get("/people/1")
+        latencies.append((time.perf_counter() - started) * 1000)
+        time.sleep(0.005)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--costs", default="12,14,15", help="comma separated log2(n) values")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    url = args.database_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    seed(url, 100)
+    os.environ["DATABASE_URL"] = url
+    os.environ.setdefault("CACHE_BACKEND", "none")
+    os.environ.setdefault("INSTRUMENTATION", "0")
+
+    import app as app_module
+    from passwords import PasswordHasher
+
+    app = app_module.create_app(admin=False, migrate=False)
+    results = {"requests": args.requests, "concurrency": args.concurrency, "workers": args.workers, "costs": {}}
+    for cost in (int(value) for value in args.costs.split(",")):
+        app_module.password_hasher = PasswordHasher(n=2 ** cost, workers=args.workers)
+        prefix = "bench-%s" % uuid.uuid4().hex[:8]
+
+        stop = threading.Event()
+        with ThreadPoolExecutor(max_workers=1) as prober:
+            probe = prober.submit(probe_latency, app, stop)
+            signup = run(app, args.requests, args.concurrency, lambda client, i: client.post(
+                "/users", json={"email": "%s-%d@example.com" % (prefix, i), "password": "secret"}))
+            login = run(app, args.requests, args.concurrency, lambda client, i: client.post(
+                "/login", json={"email": "%s-%d@example.com" % (prefix, i), "password": "secret"}))
+            stop.set()
+            latencies = probe.result()
+
+        results["costs"]["n=2^%d" % cost] = {
+            "signup_per_sec": round(signup, 1),
+            "login_per_sec": round(login, 1),
+            "other_request_ms_p50": round(statistics.median(latencies), 2) if latencies else None,
+            "other_request_ms_max": round(max(latencies), 2) if latencies else None,
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Seeds the schema from src/models.py with synthetic data for benchmarks.
+
+    python benchmarks/seed.py --scale 100k --database-url postgresql://...
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from sqlalchemy import create_engine, insert
+from models import db, User, Profile, People, Planet, Favorite
+
+SCALES = {"1k": 1000, "10k": 10000, "100k": 100000, "1m": 1000000}
+CHUNK = 20000
+
+
+def insert_chunked(conn, model, rows, make_row):
+    for start in range(0, rows, CHUNK):
+        end = min(start + CHUNK, rows)
+        conn.execute(insert(model), [make_row(i) for i in range(start, end)])
+
+
+def seed(url, rows):
+    """
+    Recreates the schema and inserts `rows` users, profiles, people, planets
+    and favorites. Ids run from 1 to rows in every table; user i + 1
+    favorites person i + 1 when i is even, and user i favorites planet i + 1
+    when i is odd.
+    """
+    engine = create_engine(url)
+    db.metadata.drop_all(engine)
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        # favorite_count coincide con los favoritos insertados más abajo
+        insert_chunked(conn, People, rows, lambda i: {"name": "person-%d" % i, "favorite_count": 1 - i % 2})
+        insert_chunked(conn, Planet, rows, lambda i: {"name": "planet-%d" % i, "favorite_count": i % 2})
+        insert_chunked(conn, User, rows, lambda i: {"email": "user-%d@example.com" % i, "password": "x"})
+        insert_chunked(conn, Profile, rows, lambda i: {"user_id": i + 1, "bio": "bio %d" % i})
+        # Uno de cada dos usuarios tiene favoritos
+        insert_chunked(conn, Favorite, rows,
+                       lambda i: {"user_id": i + 1, "people_id": i + 1, "planet_id": None} if i % 2 == 0
+                       else {"user_id": i, "people_id": None, "planet_id": i + 1})
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", choices=SCALES, default="1k")
+    parser.add_argument("--database-url", required=True)
+    args = parser.parse_args()
+    seed(args.database_url, SCALES[args.scale])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Rows serialized per second for a people listing, comparing ORM objects with
+serialize() against column tuples, each encoded with Flask's default JSON
+provider and with the orjson provider.
+
+    python benchmarks/serialization.py --rows 100000 --repeat 5
+
+Each measurement covers the query, building the dicts and encoding the JSON
+body, which is the work a listing handler does per page; the encode_only
+entries time the encoder alone on prebuilt dicts. Prints the best of
+--repeat runs as JSON.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+from sqlalchemy import select
+
+from seed import seed
+
+
+def timed(fn):
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    url = args.database_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    seed(url, args.rows)
+    os.environ["DATABASE_URL"] = url
+
+    from flask.json.provider import DefaultJSONProvider
+    from app import create_app
+    from json_provider import OrjsonProvider
+    from models import db, People, PEOPLE_COLUMNS, serialize_row
+
+    app = create_app(admin=False, migrate=False)
+    providers = {"default": DefaultJSONProvider(app), "orjson": OrjsonProvider(app)}
+    loaders = {
+        "orm": lambda: [person.serialize() for person in db.session.scalars(select(People).order_by(People.id))],
+        "tuples": lambda: [serialize_row(row) for row in db.session.execute(select(*PEOPLE_COLUMNS).order_by(People.id))],
+    }
+
+    results = {"rows": args.rows}
+    with app.app_context():
+        for loader_name, loader in loaders.items():
+            for provider_name, provider in providers.items():
+                times = []
+                for _ in range(args.repeat):
+                    db.session.expunge_all()
+                    times.append(timed(lambda: provider.response(loader())))
+                best = min(times)
+                results["%s+%s" % (loader_name, provider_name)] = {
+                    "seconds": round(best, 4),
+                    "rows_per_sec": round(args.rows / best),
+                }
+
+        # Solo la codificación, sobre dicts ya construidos
+        data = loaders["tuples"]()
+        for provider_name, provider in providers.items():
+            best = min(timed(lambda: provider.response(data)) for _ in range(args.repeat))
+            results["encode_only+%s" % provider_name] = {
+                "seconds": round(best, 4),
+                "rows_per_sec": round(args.rows / best),
+            }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
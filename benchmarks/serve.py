@@ -0,0 +1,39 @@
+"""
+WSGI application used by the benchmark harness: the app from src/app.py
+plus an X-Query-Count response header with the number of SQL statements
+each request ran.
+
+    gunicorn serve:application --chdir benchmarks
+"""
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from sqlalchemy import event
+
+from app import create_app, db
+
+application = create_app()
+
+counter = threading.local()
+
+
+@application.before_request
+def start_query_count():
+    counter.queries = 0
+
+
+@application.after_request
+def send_query_count(response):
+    response.headers["X-Query-Count"] = str(getattr(counter, "queries", 0))
+    return response
+
+
+def count_query(*args):
+    counter.queries = getattr(counter, "queries", 0) + 1
+
+
+with application.app_context():
+    event.listen(db.engine, "before_cursor_execute", count_query)
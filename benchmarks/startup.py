@@ -0,0 +1,70 @@
+"""
+Worker cold start: time to import the app and build it with create_app(),
+time to its first response, and the process RSS afterwards, for the full
+app and for an API-only worker (ENABLE_ADMIN=0, ENABLE_MIGRATE=0).
+
+    python benchmarks/startup.py --runs 10
+
+Every run is a fresh Python process, as a new gunicorn worker would be
+with preload disabled. Prints the median of --runs as JSON.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, "..", "src")
+
+from seed import seed
+
+CONFIGS = {
+    "full": {"ENABLE_ADMIN": "1", "ENABLE_MIGRATE": "1"},
+    "api_only": {"ENABLE_ADMIN": "0", "ENABLE_MIGRATE": "0"},
+}
+
+# Se ejecuta en un proceso nuevo por medición
+CHILD = """
+import json, resource, sys, time
+started = time.perf_counter()
+sys.path.insert(0, %r)
+from app import create_app
+app = create_app()
+created = time.perf_counter()
+response = app.test_client().get("/people/1")
+assert response.status_code == 200, response.status_code
+served = time.perf_counter()
+print(json.dumps({
+    "create_app_ms": (created - started) * 1000,
+    "first_response_ms": (served - started) * 1000,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "modules": len(sys.modules),
+}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    url = args.database_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    seed(url, 100)
+
+    results = {"runs": args.runs}
+    for name, config in CONFIGS.items():
+        env = dict(os.environ, DATABASE_URL=url, **config)
+        samples = [json.loads(subprocess.run([sys.executable, "-c", CHILD % SRC], env=env, check=True,
+                                             capture_output=True, text=True).stdout)
+                   for _ in range(args.runs)]
+        results[name] = {key: round(statistics.median(sample[key] for sample in samples), 1)
+                         for key in samples[0]}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
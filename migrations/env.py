@@ -38,6 +38,15 @@ def get_metadata():
     return target_db.metadata
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    # Los índices y tablas de búsqueda se crean con SQL propio
+    # (models.SEARCH_DDL): autogenerate no debe proponer borrarlos
+    if reflected and compare_to is None and name and (
+            "_fts" in name or name.endswith(("_name_trgm", "_name_nocase"))):
+        return False
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -52,7 +61,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -80,10 +90,16 @@ def run_migrations_online():
     connectable = current_app.extensions['migrate'].db.get_engine()
 
     with connectable.connect() as connection:
+        # En SQLite el batch recrea tablas con DROP TABLE: con las claves
+        # foráneas activas dispararía los ON DELETE CASCADE
+        if connection.dialect.name == 'sqlite':
+            connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+            connection.commit()
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
             process_revision_directives=process_revision_directives,
+            include_object=include_object,
             **current_app.extensions['migrate'].configure_args
         )
 
@@ -0,0 +1,52 @@
+"""add unique name indexes
+
+Revision ID: 26092fa85ad6
+Revises: 7d800dc3ab45
+Create Date: 2026-10-18 10:41:07.518230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '26092fa85ad6'
+down_revision = '7d800dc3ab45'
+branch_labels = None
+depends_on = None
+
+
+def check_duplicate_names(table):
+    # Los duplicados no se borran: hay favoritos que apuntan a ellos. Se
+    # listan para que se resuelvan a mano antes de migrar
+    rows = op.get_bind().execute(sa.text(
+        "SELECT name, id FROM %s WHERE name IN "
+        "(SELECT name FROM %s GROUP BY name HAVING COUNT(*) > 1) ORDER BY name, id" % (table, table))).all()
+    if not rows:
+        return []
+    ids = {}
+    for name, row_id in rows:
+        ids.setdefault(name, []).append(str(row_id))
+    return ["%s: %r (ids %s)" % (table, name, ", ".join(row_ids)) for name, row_ids in ids.items()]
+
+
+def upgrade():
+    duplicates = check_duplicate_names('people') + check_duplicate_names('planets')
+    if duplicates:
+        raise RuntimeError(
+            "Cannot create the unique name indexes, these names are repeated:\n  %s\n"
+            "Rename or merge the rows (and move their favorites) before upgrading." % "\n  ".join(duplicates))
+
+    with op.batch_alter_table('people', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_people_name'), ['name'], unique=True)
+
+    with op.batch_alter_table('planets', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_planets_name'), ['name'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('planets', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_planets_name'))
+
+    with op.batch_alter_table('people', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_people_name'))
@@ -0,0 +1,56 @@
+"""add favorite_count to people and planets
+
+Revision ID: 5b2e7c90d1a4
+Revises: a48f1c2b9e07
+Create Date: 2026-10-18 16:02:11.904215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b2e7c90d1a4'
+down_revision = 'a48f1c2b9e07'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ('people', 'planets')
+
+# Triggers de la búsqueda FTS5 (a48f1c2b9e07) en SQLite
+FTS_TRIGGERS = (
+    "CREATE TRIGGER {0}_fts_insert AFTER INSERT ON {0} BEGIN "
+    "INSERT INTO {0}_fts(rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER {0}_fts_delete AFTER DELETE ON {0} BEGIN "
+    "INSERT INTO {0}_fts({0}_fts, rowid, name) VALUES ('delete', old.id, old.name); END",
+    "CREATE TRIGGER {0}_fts_update AFTER UPDATE OF name ON {0} BEGIN "
+    "INSERT INTO {0}_fts({0}_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+    "INSERT INTO {0}_fts(rowid, name) VALUES (new.id, new.name); END",
+)
+
+
+def upgrade():
+    # Sin batch_alter_table: en SQLite recrearía las tablas y perdería los
+    # triggers de la búsqueda; ADD COLUMN con DEFAULT funciona directamente
+    for table in TABLES:
+        op.add_column(table, sa.Column('favorite_count', sa.Integer(), server_default=sa.text('0'), nullable=False))
+
+        # Contadores iniciales a partir de los favoritos existentes
+        column = 'people_id' if table == 'people' else 'planet_id'
+        op.execute("UPDATE {0} SET favorite_count = "
+                   "(SELECT count(*) FROM favorites WHERE favorites.{1} = {0}.id)".format(table, column))
+
+        op.create_index('ix_{0}_favorite_count_id'.format(table), table, ['favorite_count', 'id'], unique=False)
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_index('ix_{0}_favorite_count_id'.format(table), table_name=table)
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('favorite_count')
+
+        # SQLite recrea la tabla para quitar la columna: se restauran los triggers
+        if op.get_bind().dialect.name == 'sqlite':
+            for trigger in FTS_TRIGGERS:
+                op.execute(trigger.format(table))
@@ -0,0 +1,52 @@
+"""add favorites indexes
+
+Revision ID: 7d800dc3ab45
+Revises: 176b329a5c41
+Create Date: 2026-10-18 10:12:41.306512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d800dc3ab45'
+down_revision = '176b329a5c41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Eliminar favoritos duplicados antes de crear los indices unicos
+    op.execute(
+        "DELETE FROM favorites WHERE planet_id IS NOT NULL AND id NOT IN "
+        "(SELECT * FROM (SELECT MIN(id) FROM favorites WHERE planet_id IS NOT NULL "
+        "GROUP BY user_id, planet_id) AS keep)"
+    )
+    op.execute(
+        "DELETE FROM favorites WHERE people_id IS NOT NULL AND id NOT IN "
+        "(SELECT * FROM (SELECT MIN(id) FROM favorites WHERE people_id IS NOT NULL "
+        "GROUP BY user_id, people_id) AS keep)"
+    )
+
+    with op.batch_alter_table('favorites', schema=None) as batch_op:
+        batch_op.create_index('ix_favorites_user_id_planet_id', ['user_id', 'planet_id'], unique=False)
+        batch_op.create_index('ix_favorites_user_id_people_id', ['user_id', 'people_id'], unique=False)
+        batch_op.create_index('ix_favorites_planet_id', ['planet_id'], unique=False)
+        batch_op.create_index('ix_favorites_people_id', ['people_id'], unique=False)
+        batch_op.create_index('uq_favorites_user_id_planet_id', ['user_id', 'planet_id'], unique=True,
+                              postgresql_where=sa.text('planet_id IS NOT NULL'),
+                              sqlite_where=sa.text('planet_id IS NOT NULL'))
+        batch_op.create_index('uq_favorites_user_id_people_id', ['user_id', 'people_id'], unique=True,
+                              postgresql_where=sa.text('people_id IS NOT NULL'),
+                              sqlite_where=sa.text('people_id IS NOT NULL'))
+
+
+def downgrade():
+    with op.batch_alter_table('favorites', schema=None) as batch_op:
+        batch_op.drop_index('uq_favorites_user_id_people_id')
+        batch_op.drop_index('uq_favorites_user_id_planet_id')
+        batch_op.drop_index('ix_favorites_people_id')
+        batch_op.drop_index('ix_favorites_planet_id')
+        batch_op.drop_index('ix_favorites_user_id_people_id')
+        batch_op.drop_index('ix_favorites_user_id_planet_id')
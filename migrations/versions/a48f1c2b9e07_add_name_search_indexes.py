@@ -0,0 +1,62 @@
+"""add name search indexes
+
+Revision ID: a48f1c2b9e07
+Revises: 26092fa85ad6
+Create Date: 2026-10-18 15:12:40.381902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a48f1c2b9e07'
+down_revision = '26092fa85ad6'
+branch_labels = None
+depends_on = None
+
+TABLES = ('people', 'planets')
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    # Trigramas para ILIKE (requiere permiso para crear la extensión)
+    if dialect == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for table in TABLES:
+            op.execute("CREATE INDEX ix_{0}_name_trgm ON {0} USING gin (name gin_trgm_ops)".format(table))
+
+    # Índice NOCASE para prefijos y FTS5 sincronizada por triggers
+    elif dialect == 'sqlite':
+        for table in TABLES:
+            op.execute("CREATE INDEX ix_{0}_name_nocase ON {0} (name COLLATE NOCASE)".format(table))
+            op.execute(
+                "CREATE VIRTUAL TABLE {0}_fts USING fts5(name, content='{0}', content_rowid='id', "
+                "tokenize='unicode61 remove_diacritics 2', prefix='2 3')".format(table))
+            op.execute(
+                "CREATE TRIGGER {0}_fts_insert AFTER INSERT ON {0} BEGIN "
+                "INSERT INTO {0}_fts(rowid, name) VALUES (new.id, new.name); END".format(table))
+            op.execute(
+                "CREATE TRIGGER {0}_fts_delete AFTER DELETE ON {0} BEGIN "
+                "INSERT INTO {0}_fts({0}_fts, rowid, name) VALUES ('delete', old.id, old.name); END".format(table))
+            op.execute(
+                "CREATE TRIGGER {0}_fts_update AFTER UPDATE OF name ON {0} BEGIN "
+                "INSERT INTO {0}_fts({0}_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+                "INSERT INTO {0}_fts(rowid, name) VALUES (new.id, new.name); END".format(table))
+            op.execute("INSERT INTO {0}_fts({0}_fts) VALUES ('rebuild')".format(table))
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        for table in TABLES:
+            op.execute("DROP INDEX ix_{0}_name_trgm".format(table))
+
+    elif dialect == 'sqlite':
+        for table in TABLES:
+            for trigger in ('insert', 'delete', 'update'):
+                op.execute("DROP TRIGGER {0}_fts_{1}".format(table, trigger))
+            op.execute("DROP TABLE {0}_fts".format(table))
+            op.execute("DROP INDEX ix_{0}_name_nocase".format(table))
@@ -0,0 +1,42 @@
+"""favorites and profiles on delete cascade
+
+Revision ID: c71d3e5f8a20
+Revises: 5b2e7c90d1a4
+Create Date: 2026-10-18 17:20:36.114027
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c71d3e5f8a20'
+down_revision = '5b2e7c90d1a4'
+branch_labels = None
+depends_on = None
+
+# Las claves se crearon sin nombre: Postgres las llamó <tabla>_<columna>_fkey
+# y en SQLite el batch les da ese mismo nombre con esta convención
+NAMING_CONVENTION = {"fk": "%(table_name)s_%(column_0_name)s_fkey"}
+
+FOREIGN_KEYS = {
+    'favorites': (('user_id', 'users'), ('people_id', 'people'), ('planet_id', 'planets')),
+    'profiles': (('user_id', 'users'),),
+}
+
+
+def replace_foreign_keys(ondelete):
+    for table, foreign_keys in FOREIGN_KEYS.items():
+        with op.batch_alter_table(table, schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+            for column, referred_table in foreign_keys:
+                name = '{0}_{1}_fkey'.format(table, column)
+                batch_op.drop_constraint(name, type_='foreignkey')
+                batch_op.create_foreign_key(name, referred_table, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    replace_foreign_keys('CASCADE')
+
+
+def downgrade():
+    replace_foreign_keys(None)
@@ -0,0 +1,30 @@
+"""covering index on favorites (user_id, people_id, planet_id)
+
+Revision ID: e8a4d2f61b37
+Revises: c71d3e5f8a20
+Create Date: 2026-10-18 19:40:27.118530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8a4d2f61b37'
+down_revision = 'c71d3e5f8a20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # El nuevo índice empieza por (user_id, people_id): sustituye al anterior
+    with op.batch_alter_table('favorites', schema=None) as batch_op:
+        batch_op.create_index('ix_favorites_user_id_people_id_planet_id',
+                              ['user_id', 'people_id', 'planet_id'], unique=False)
+        batch_op.drop_index('ix_favorites_user_id_people_id')
+
+
+def downgrade():
+    with op.batch_alter_table('favorites', schema=None) as batch_op:
+        batch_op.create_index('ix_favorites_user_id_people_id', ['user_id', 'people_id'], unique=False)
+        batch_op.drop_index('ix_favorites_user_id_people_id_planet_id')
@@ -1,22 +1,71 @@
 import os
 from flask_admin import Admin
-from models import db, User, Profile , People , Planet, Favorite
+from models import db, User, Profile , People , Planet, Favorite, subtract_favorite_counts
 from flask_admin.contrib.sqla import ModelView
 
-def setup_admin(app):
+
+class CatalogView(ModelView):
+    # favorite_count lo mantienen los handlers de favoritos, y los favoritos
+    # se editan solo por la API: aquí no se tocan
+    form_excluded_columns = ("favorite_count", "favorites")
+
+    def __init__(self, model, session, response_cache, favorite_sets):
+        super().__init__(model, session)
+        self.response_cache = response_cache
+        self.favorite_sets = favorite_sets
+
+    def after_model_change(self, form, model, is_created):
+        self.response_cache.invalidate(model.__tablename__, model.id)
+
+    def after_model_delete(self, model):
+        # La BD borró sus favoritos en cascada
+        self.response_cache.invalidate(model.__tablename__, model.id)
+        self.response_cache.invalidate("favorites")
+        self.favorite_sets.invalidate_targets()
+
+
+class UserView(ModelView):
+    form_excluded_columns = ("favorites",)
+
+    def __init__(self, model, session, response_cache, favorite_sets):
+        super().__init__(model, session)
+        self.response_cache = response_cache
+        self.favorite_sets = favorite_sets
+
+    def on_model_delete(self, model):
+        # Antes del DELETE, en la misma transacción, como delete_user
+        subtract_favorite_counts(Favorite.user_id == model.id)
+
+    def after_model_change(self, form, model, is_created):
+        self.response_cache.invalidate("users", model.id)
+
+    def after_model_delete(self, model):
+        self.response_cache.invalidate("users", model.id)
+        self.response_cache.invalidate("favorites")
+        self.favorite_sets.invalidate(model.id)
+
+
+class ReadOnlyView(ModelView):
+    # Los favoritos cambian contadores y cachés: se escriben por la API
+    can_create = False
+    can_edit = False
+    can_delete = False
+
+
+def setup_admin(app, response_cache, favorite_sets):
     app.secret_key = os.environ.get('FLASK_APP_KEY', 'sample key')
     app.config['FLASK_ADMIN_SWATCH'] = 'cerulean'
     admin = Admin(app, name='4Geeks Admin', template_mode='bootstrap3')
 
-    
+
     # Add your models here, for example this is how we add a the User model to the admin
-    admin.add_view(ModelView(User, db.session))
+    admin.add_view(UserView(User, db.session, response_cache, favorite_sets))
     admin.add_view(ModelView(Profile, db.session))
-    admin.add_view(ModelView(People, db.session))
-    admin.add_view(ModelView(Planet, db.session))
-    admin.add_view(ModelView(Favorite, db.session))
+    admin.add_view(CatalogView(People, db.session, response_cache, favorite_sets))
+    admin.add_view(CatalogView(Planet, db.session, response_cache, favorite_sets))
+    admin.add_view(ReadOnlyView(Favorite, db.session))
+
 
-   
 
     # You can duplicate that line to add mew models
-    # admin.add_view(ModelView(YourModelName, db.session))
\ No newline at end of file
+    # admin.add_view(ModelView(YourModelName, db.session))
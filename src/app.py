@@ -2,61 +2,131 @@
 This module takes care of starting the API Server, Loading the DB and Adding the endpoints
 """
 import os
-from flask import Flask, request, jsonify, url_for
-from flask_migrate import Migrate
-from flask_swagger import swagger
+from flask import Blueprint, Flask, current_app, request, jsonify, url_for, Response, stream_with_context
 from flask_cors import CORS
-from utils import APIException, generate_sitemap
-from admin import setup_admin
-from models import db, User, Profile, People, Planet, Favorite
-from sqlalchemy import select
+from utils import (APIException, generate_sitemap, paginate, page_response, get_list_arg,
+                   get_page_args, encode_cursor, get_bulk_items, bulk_error, bulk_response,
+                   get_ids_arg, ids_response, internal_only)
+from cache import ResponseCache, MembershipCache, cache_from_env
+from pool import engine_options_from_env, env_flag, pool_metrics
+from instrumentation import setup_instrumentation
+from compress import compressor_from_env, setup_compression
+from json_provider import json_provider_from_env
+from passwords import password_hasher_from_env
+from search import SEARCH_COLLECTIONS, MAX_QUERY_LENGTH, name_prefix_filter, search
+from models import (db, User, Profile, People, Planet, Favorite, USER_LOAD, USER_FAVORITES_LOAD,
+                    USER_FIELDS, USER_EXPANSIONS, user_load_options,
+                    PEOPLE_COLUMNS, PLANET_COLUMNS, PEOPLE_LEADERBOARD_COLUMNS, PLANET_LEADERBOARD_COLUMNS,
+                    serialize_row, update_favorite_counts, subtract_favorite_counts, delete_favorites,
+                    upsert_favorite)
+from sqlalchemy import select, insert, update, delete, or_
+from sqlalchemy.exc import IntegrityError
 # from models import Person
 
-app = Flask(__name__)
-app.url_map.strict_slashes = False
-
-db_url = os.getenv("DATABASE_URL")
-if db_url is not None:
-    app.config['SQLALCHEMY_DATABASE_URI'] = db_url.replace(
-        "postgres://", "postgresql://")
-else:
-    app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-MIGRATE = Migrate(app, db)
-db.init_app(app)
-CORS(app)
-setup_admin(app)
+# Todas las rutas de la API; create_app las registra en cada app
+api = Blueprint("api", __name__)
+
+# Caché de respuestas para el catálogo (people, planets) y ETags
+response_cache = ResponseCache(cache_from_env())
+
+# Compresión gzip/br/zstd; guarda los bytes comprimidos de las respuestas con ETag
+response_compressor = compressor_from_env(response_cache.backend)
+
+# Ids de los favoritos de cada usuario, en el mismo backend (write-through)
+favorite_sets = MembershipCache(response_cache.backend, "user_favorites", ("people", "planets"))
+
+# Hashing de contraseñas (scrypt) en un pool de hilos acotado
+password_hasher = password_hasher_from_env()
+
+# Los usuarios incluyen los nombres de sus people/planets favoritos
+USER_DEPENDS_ON = ("people", "planets")
+
+def create_app(admin=None, migrate=None):
+    """
+    Builds the Flask app. admin mounts the Flask-Admin UI at /admin/ and
+    migrate registers Flask-Migrate for the `flask db` commands; both
+    default to the ENABLE_ADMIN and ENABLE_MIGRATE environment variables
+    (1). API-only workers need neither, and without them Flask-Admin and
+    Alembic are never imported.
+    """
+    app = Flask(__name__)
+    app.url_map.strict_slashes = False
+    app.json = json_provider_from_env(app)
+
+    db_url = os.getenv("DATABASE_URL")
+    if db_url is not None:
+        app.config['SQLALCHEMY_DATABASE_URI'] = db_url.replace(
+            "postgres://", "postgresql://")
+    else:
+        app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options_from_env(
+        app.config['SQLALCHEMY_DATABASE_URI'])
+
+    db.init_app(app)
+    CORS(app)
+
+    # Importaciones pesadas solo cuando se usan
+    if env_flag("ENABLE_MIGRATE", "1") if migrate is None else migrate:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    if env_flag("ENABLE_ADMIN", "1") if admin is None else admin:
+        from admin import setup_admin
+        setup_admin(app, response_cache, favorite_sets)
+
+    setup_instrumentation(app)
+    app.register_blueprint(api)
+    setup_compression(app, response_compressor)
+    return app
+
+def get_user_view_args(args=None):
+    # ?fields=id,email y ?expand=profile,favorites; sin ellos, el usuario completo
+    return get_list_arg("fields", USER_FIELDS, args), get_list_arg("expand", USER_EXPANSIONS, args)
 
 # Handle/serialize errors like a JSON object
 
-@app.errorhandler(APIException)
+@api.app_errorhandler(APIException)
 def handle_invalid_usage(error):
     return jsonify(error.to_dict()), error.status_code
 # generate sitemap with all your endpoints
 
-@app.route('/')
+@api.route('/')
 def sitemap():
-    return generate_sitemap(app)
+    return generate_sitemap(current_app)
+
+# Métricas del pool de conexiones (uso interno, con INTERNAL_TOKEN)
+@api.route('/internal/pool', methods=['GET'])
+@internal_only
+def get_pool_metrics():
+    return jsonify(pool_metrics(db.engine)), 200
 
 # **User Methods** ------------------------------------------------->
 
     # GET Todos los Usuarios
-@app.route("/users", methods=["GET"])
+@api.route("/users", methods=["GET"])
+@response_cache.conditional("users", depends_on=USER_DEPENDS_ON)
 def get_users():
-    users = User.query.all()
-    return jsonify([user.serialize() for user in users]), 200
+    fields, expand = get_user_view_args()
+    # ?ids=1,2,3: varios usuarios en una sola consulta WHERE id IN (...)
+    ids = get_ids_arg()
+    if ids is not None:
+        users = User.query.options(*user_load_options(expand)).filter(User.id.in_(ids)).all()
+        return jsonify(ids_response({user.id: user.serialize(fields, expand) for user in users}, ids)), 200
+    users, next_cursor = paginate(User.query.options(*user_load_options(expand)), User.id)
+    return jsonify(page_response([user.serialize(fields, expand) for user in users], next_cursor)), 200
 
     # GET  Usuario por ID 
-@app.route("/users/<int:user_id>", methods=["GET"])
+@api.route("/users/<int:user_id>", methods=["GET"])
+@response_cache.conditional("users", id_arg="user_id", depends_on=USER_DEPENDS_ON)
 def get_user(user_id):
-    user = User.query.get(user_id)
+    fields, expand = get_user_view_args()
+    user = User.query.options(*user_load_options(expand)).get(user_id)
     if not user:
         return jsonify({"error": "User not found"}), 404
-    return jsonify(user.serialize()), 200
+    return jsonify(user.serialize(fields, expand)), 200
 
     # POST  Usuario 
-@app.route("/users", methods=["POST"])
+@api.route("/users", methods=["POST"])
 def create_user():
     data = request.get_json()
     if not data or not data.get("email") or not data.get("password"):
@@ -66,14 +136,15 @@ def create_user():
     if existing_user:
         return jsonify({"error": "Email already exists"}), 400
 
-    # En producción, usamos hashing
-    new_user = User(email=data["email"], password=data["password"])
+    # Solo se guarda el hash scrypt de la contraseña
+    new_user = User(email=data["email"], password=password_hasher.hash(data["password"]))
     db.session.add(new_user)
     db.session.commit()
+    response_cache.invalidate("users")
     return jsonify(new_user.serialize()), 201
 
     # PUT  Usuario ID
-@app.route("/users/<int:id>", methods=["PUT"])
+@api.route("/users/<int:id>", methods=["PUT"])
 def update_user(id):
     data = request.get_json()
     user = User.query.get(id)
@@ -92,46 +163,69 @@ def update_user(id):
 
     # Actualizar los campos si se enviaron
     user.email = data.get("email", user.email)
-    user.password = data.get("password", user.password)
+    if data.get("password"):
+        user.password = password_hasher.hash(data["password"])
 
     db.session.commit()
+    response_cache.invalidate("users", id)
     return jsonify(user.serialize()), 200
 
     # DELETE  Usuario ID
-@app.route("/users/<int:user_id>", methods=["DELETE"])
+@api.route("/users/<int:user_id>", methods=["DELETE"])
 def delete_user(user_id):
-    user = User.query.get(user_id)
-    if not user:
-        return jsonify({"error": "User not found"}), 404
-
     try:
-        # Eliminar favoritos asociados (si es necesario)
-        Favorite.query.filter_by(user_id=user_id).delete()
-
-        # Eliminar perfil asociado (si es necesario)
-        if user.profile:
-            db.session.delete(user.profile)
-
-        # Eliminar el usuario
-        db.session.delete(user)
+        # Bloquear la fila del usuario (FOR UPDATE): hasta el COMMIT nadie
+        # puede añadirle favoritos, que el borrado en cascada no descontaría
+        if db.session.scalar(select(User.id).where(User.id == user_id).with_for_update()) is None:
+            db.session.rollback()
+            return jsonify({"error": "User not found"}), 404
+        # Descontar sus favoritos de los contadores (bloqueados, sin
+        # traerlos) y eliminar el usuario: la BD borra su perfil y sus
+        # favoritos (ON DELETE CASCADE)
+        subtract_favorite_counts(Favorite.user_id == user_id)
+        db.session.execute(delete(User).where(User.id == user_id))
         db.session.commit()
+        response_cache.invalidate("users", user_id)
+        response_cache.invalidate("favorites")
+        favorite_sets.invalidate(user_id)
 
         return jsonify({"message": "User deleted successfully"}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
+
+    # POST Login
+@api.route("/login", methods=["POST"])
+def login():
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data.get("email"), str) or not isinstance(data.get("password"), str):
+        return jsonify({"error": "Missing or invalid data"}), 400
+
+    user = User.query.filter_by(email=data["email"]).first()
+    # Sin usuario también se calcula un hash (dummy_hash): el tiempo de
+    # respuesta no revela si el email existe
+    stored = user.password if user else password_hasher.dummy_hash
+    if not password_hasher.verify(stored, data["password"]) or not user:
+        return jsonify({"error": "Invalid email or password"}), 401
+
+    # Contraseñas en texto plano o con otro coste: se guarda un hash nuevo
+    if password_hasher.needs_rehash(user.password):
+        user.password = password_hasher.hash(data["password"])
+        db.session.commit()
+
+    return jsonify({"message": "Login successful", "user": user.serialize(USER_FIELDS, ())}), 200
  #------------------------------------------------->   
      
 # **Profiles Methods** ------------------------------------------------->
 
     # GET Perfiles 
-@app.route("/profiles", methods=["GET"])
+@api.route("/profiles", methods=["GET"])
 def get_profiles():
-    profiles = Profile.query.all()
-    return jsonify([p.serialize() for p in profiles]), 200
+    profiles, next_cursor = paginate(Profile.query, Profile.id)
+    return jsonify(page_response([p.serialize() for p in profiles], next_cursor)), 200
 
     # GET Perfiles ID
-@app.route("/profiles/<int:id>", methods=["GET"])
+@api.route("/profiles/<int:id>", methods=["GET"])
 def get_profile(id):
     profile = Profile.query.get(id)
     if not profile:
@@ -139,7 +233,7 @@ def get_profile(id):
     return jsonify(profile.serialize()), 200
 
     # POST Perfiles ID
-@app.route("/profiles/<int:id>", methods=["POST"])
+@api.route("/profiles/<int:id>", methods=["POST"])
 def create_profile(id):
     data = request.get_json()
     if not data or "bio" not in data:
@@ -152,10 +246,11 @@ def create_profile(id):
     new_profile = Profile(bio=data["bio"], user_id=id)
     db.session.add(new_profile)
     db.session.commit()
+    response_cache.invalidate("users", id)
     return jsonify(new_profile.serialize()), 201
 
     # PUT Perfiles ID
-@app.route("/profiles/<int:id>", methods=["PUT"])
+@api.route("/profiles/<int:id>", methods=["PUT"])
 def update_profile(id):
     profile = Profile.query.get(id)
     if not profile:
@@ -171,10 +266,11 @@ def update_profile(id):
     profile.bio = data.get("bio", profile.bio)
 
     db.session.commit()
+    response_cache.invalidate("users", profile.user_id)
     return jsonify(profile.serialize()), 200
   
     # DELETE Perfiles ID
-@app.route("/profileseee/<int:user_id>", methods=["DELETE"])
+@api.route("/profileseee/<int:user_id>", methods=["DELETE"])
 def delete_profile(user_id):
     user = User.query.get(user_id)
     if not user:
@@ -185,6 +281,7 @@ def delete_profile(user_id):
         if user.profile:
             db.session.delete(user.profile)
             db.session.commit()
+            response_cache.invalidate("users", user_id)
 
         return jsonify({"message": "Profile deleted successfully"}), 200
     except Exception as e:
@@ -195,13 +292,25 @@ def delete_profile(user_id):
 # **People Methods** ------------------------------------------------->
 
     # GET People
-@app.route('/people', methods=['GET'])
+@api.route('/people', methods=['GET'])
+@response_cache.cached("people")
 def get_people():
-    people_list = People.query.all()
-    return jsonify([person.serialize() for person in people_list])
+    # Solo id y name como tuplas: sin objetos ORM ni identity map
+    query = db.session.query(*PEOPLE_COLUMNS)
+    # ?ids=1,2,3: varias filas en una sola consulta WHERE id IN (...)
+    ids = get_ids_arg()
+    if ids is not None:
+        rows = query.filter(People.id.in_(ids)).all()
+        return jsonify(ids_response({row.id: serialize_row(row) for row in rows}, ids))
+    prefix = get_name_prefix()
+    if prefix:
+        query = query.filter(name_prefix_filter(People, prefix))
+    rows, next_cursor = paginate(query, People.id)
+    return jsonify(page_response([serialize_row(row) for row in rows], next_cursor))
 
     # GET People ID
-@app.route('/people/<int:people_id>', methods=['GET'])
+@api.route('/people/<int:people_id>', methods=['GET'])
+@response_cache.cached("people", id_arg="people_id")
 def get_person(people_id):
     person = People.query.get(people_id)
     if not person:
@@ -209,7 +318,7 @@ def get_person(people_id):
     return jsonify(person.serialize())
 
     # POST People 
-@app.route("/people/", methods=["POST"])
+@api.route("/people/", methods=["POST"])
 def create_person():
     data = request.get_json()
 
@@ -217,20 +326,20 @@ def create_person():
     if not data or not data.get("name"):
         return jsonify({"error": "Missing or invalid data"}), 400
 
-    # Verificar si la persona ya existe por nombre
-    existing_person = People.query.filter_by(name=data["name"]).first()
-    if existing_person:
-        return jsonify({"error": "Person already exists"}), 400
-
-    # Crear la nueva persona
+    # Crear la nueva persona; el índice único sobre name rechaza duplicados
     new_person = People(name=data["name"])
     db.session.add(new_person)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "Person already exists"}), 400
 
+    response_cache.invalidate("people")
     return jsonify(new_person.serialize()), 201
 
     # PUT People ID
-@app.route("/people/<int:id>", methods=["PUT"])
+@api.route("/people/<int:id>", methods=["PUT"])
 def update_person(id):
     data = request.get_json()
     people = People.query.get(id)
@@ -244,24 +353,28 @@ def update_person(id):
     # Actualizar los campos si se enviaron
     people.name = data.get("name", people.name)
 
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "Person already exists"}), 400
+
+    response_cache.invalidate("people", id)
     return jsonify(people.serialize()), 200
 
     # DELETE People ID
-@app.route("/people/<int:people_id>", methods=["DELETE"])
+@api.route("/people/<int:people_id>", methods=["DELETE"])
 def delete_person(people_id):
-    # Verificar si la persona existe
-    person = People.query.get(people_id)
-    if not person:
-        return jsonify({"error": "People not found"}), 404
-
     try:
-        # Eliminar favoritos asociados (si es necesario)
-        Favorite.query.filter_by(people_id=people_id).delete()
-
-        # Eliminar la persona
-        db.session.delete(person)
+        # Eliminar la persona: la BD borra sus favoritos (ON DELETE CASCADE)
+        deleted = db.session.execute(delete(People).where(People.id == people_id)).rowcount
+        if not deleted:
+            db.session.rollback()
+            return jsonify({"error": "People not found"}), 404
         db.session.commit()
+        response_cache.invalidate("people", people_id)
+        # Sus favoritos desaparecen de varios usuarios a la vez
+        favorite_sets.invalidate_targets()
 
         return jsonify({"message": "People deleted successfully"}), 200
     except Exception as e:
@@ -273,13 +386,25 @@ def delete_person(people_id):
 # **Planets Methods** ------------------------------------------------->
 
     # GET Todos los Planetas
-@app.route('/planets', methods=['GET'])
+@api.route('/planets', methods=['GET'])
+@response_cache.cached("planets")
 def get_planets():
-    planets_list = Planet.query.all()
-    return jsonify([planet.serialize() for planet in planets_list])
+    # Solo id y name como tuplas: sin objetos ORM ni identity map
+    query = db.session.query(*PLANET_COLUMNS)
+    # ?ids=1,2,3: varias filas en una sola consulta WHERE id IN (...)
+    ids = get_ids_arg()
+    if ids is not None:
+        rows = query.filter(Planet.id.in_(ids)).all()
+        return jsonify(ids_response({row.id: serialize_row(row) for row in rows}, ids))
+    prefix = get_name_prefix()
+    if prefix:
+        query = query.filter(name_prefix_filter(Planet, prefix))
+    rows, next_cursor = paginate(query, Planet.id)
+    return jsonify(page_response([serialize_row(row) for row in rows], next_cursor))
 
     # GET Planetas por ID
-@app.route('/planets/<int:planet_id>', methods=['GET'])
+@api.route('/planets/<int:planet_id>', methods=['GET'])
+@response_cache.cached("planets", id_arg="planet_id")
 def get_planet(planet_id):
     planet = Planet.query.get(planet_id)
     if not planet:
@@ -287,7 +412,7 @@ def get_planet(planet_id):
     return jsonify(planet.serialize())
 
     # POST Planetas 
-@app.route("/planets", methods=["POST"])
+@api.route("/planets", methods=["POST"])
 def create_planet():
     data = request.get_json()
 
@@ -295,20 +420,20 @@ def create_planet():
     if not data or not data.get("name"):
         return jsonify({"error": "Missing or invalid data"}), 400
 
-    # Verificar si el planeta ya existe por nombre
-    existing_planet = Planet.query.filter_by(name=data["name"]).first()
-    if existing_planet:
-        return jsonify({"error": "Planet already exists"}), 400
-
-    # Crear el nuevo planeta
+    # Crear el nuevo planeta; el índice único sobre name rechaza duplicados
     new_planet = Planet(name=data["name"])
     db.session.add(new_planet)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "Planet already exists"}), 400
 
+    response_cache.invalidate("planets")
     return jsonify(new_planet.serialize()), 201
 
     # PUT Planetas ID
-@app.route("/planet/<int:id>", methods=["PUT"])
+@api.route("/planet/<int:id>", methods=["PUT"])
 def update_planet(id):
     data = request.get_json()
     planet = Planet.query.get(id)
@@ -322,24 +447,28 @@ def update_planet(id):
     # Actualizar los campos si se enviaron
     planet.name = data.get("name", planet.name)
 
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "Planet already exists"}), 400
+
+    response_cache.invalidate("planets", id)
     return jsonify(planet.serialize()), 200
 
     # DELETE Planetas ID
-@app.route("/planets/<int:planet_id>", methods=["DELETE"])
+@api.route("/planets/<int:planet_id>", methods=["DELETE"])
 def delete_planet(planet_id):
-    # Verificar si el planeta existe
-    planet = Planet.query.get(planet_id)
-    if not planet:
-        return jsonify({"error": "Planet not found"}), 404
-
     try:
-        # Eliminar favoritos asociados (si es necesario)
-        Favorite.query.filter_by(planet_id=planet_id).delete()
-
-        # Eliminar el planeta
-        db.session.delete(planet)
+        # Eliminar el planeta: la BD borra sus favoritos (ON DELETE CASCADE)
+        deleted = db.session.execute(delete(Planet).where(Planet.id == planet_id)).rowcount
+        if not deleted:
+            db.session.rollback()
+            return jsonify({"error": "Planet not found"}), 404
         db.session.commit()
+        response_cache.invalidate("planets", planet_id)
+        # Sus favoritos desaparecen de varios usuarios a la vez
+        favorite_sets.invalidate_targets()
 
         return jsonify({"message": "Planet deleted successfully"}), 200
     except Exception as e:
@@ -350,29 +479,55 @@ def delete_planet(planet_id):
 
 # **User/s Favorite Methods** ------------------------------------------------->
     # GET Users Favorite
-@app.route('/users/favorites', methods=['GET'])
+@api.route('/users/favorites', methods=['GET'])
 def get_users_with_favorites():
-    users = User.query.all()  # ✅ Obtener todos los usuarios
-
-    users_with_favorites = []
+    # ✅ Solo usuarios con favoritos (EXISTS en la BD), paginados por id;
+    # los favoritos de la página se cargan agrupados en una sola consulta
+    query = User.query.filter(User.favorites.any()).options(*USER_FAVORITES_LOAD)
+    users, next_cursor = paginate(query, User.id)
 
-    for user in users:
-        # ✅ Acceder directamente a los favoritos
-        user_favorites = [fav.serialize() for fav in user.favorites]
-        if user_favorites:  # ✅ Solo agregar usuarios con favoritos
-            users_with_favorites.append({
-                "user_id": user.id,
-                "email": user.email,
-                "favorites": user_favorites
-            })
+    users_with_favorites = [{
+        "user_id": user.id,
+        "email": user.email,
+        "favorites": [fav.serialize() for fav in user.favorites]
+    } for user in users]
 
     if not users_with_favorites:
         return jsonify({"message": "No users with favorites found"}), 200
 
-    return jsonify(users_with_favorites)
+    return jsonify(page_response(users_with_favorites, next_cursor))
+
+def load_favorite_sets(user_id):
+    # Solo columnas del índice (user_id, people_id, planet_id): sin JOIN ni
+    # acceso a la tabla
+    rows = db.session.execute(
+        select(Favorite.people_id, Favorite.planet_id).where(Favorite.user_id == user_id)).all()
+    if not rows and db.session.get(User, user_id) is None:
+        return None
+    return {
+        "people": {people_id for people_id, _ in rows if people_id is not None},
+        "planets": {planet_id for _, planet_id in rows if planet_id is not None},
+    }
+
+def get_favorite_sets(user_id):
+    sets = favorite_sets.get(user_id, lambda: load_favorite_sets(user_id))
+    if sets is None:
+        raise APIException("User not found", status_code=404)
+    return sets
+
+    # GET Favoritos de un Usuario
+@api.route("/users/<int:user_id>/favorites", methods=["GET"])
+def get_user_favorites(user_id):
+    sets = get_favorite_sets(user_id)
+    return jsonify({"people": sorted(sets["people"]), "planets": sorted(sets["planets"])}), 200
+
+    # GET ¿Es favorito? (people o planets)
+@api.route("/users/<int:user_id>/favorites/<any(people, planets):collection>/<int:target_id>", methods=["GET"])
+def is_user_favorite(user_id, collection, target_id):
+    return jsonify({"favorite": target_id in get_favorite_sets(user_id)[collection]}), 200
 
     # POST Favorite Planet ID 
-@app.route('/favorite/planet/<int:planet_id>', methods=['POST'])
+@api.route('/favorite/planet/<int:planet_id>', methods=['POST'])
 def add__favorite_planet(planet_id):
     data = request.get_json()
     user_id = data.get("user_id")  # obtener el usuario seleccionado
@@ -389,23 +544,26 @@ def add__favorite_planet(planet_id):
     if not planet:
         return jsonify({"error": "The selected planet does not exist in the database."})
 
-    # verificacion de si el favorito ya existe en el usuario a añadir
-
-    existing_favorite = Favorite.query.filter_by(
-        user_id=user_id, planet_id=planet_id).first()
-    if existing_favorite:
-        return jsonify({"error": "The favorite to add in user_id is already a favorite"}), 400
-
-    # creacion del nuevo favorito
+    # creacion del nuevo favorito; el indice unico (user_id, planet_id)
+    # rechaza el duplicado, incluso con dos peticiones concurrentes
 
     new_favorite = Favorite(user_id=user_id, planet_id=planet_id)
     db.session.add(new_favorite)
-    db.session.commit()
+    try:
+        update_favorite_counts([(None, planet_id)], 1)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "The favorite to add in user_id is already a favorite"}), 400
+
+    response_cache.invalidate("users", user_id)
+    response_cache.invalidate("favorites")
+    favorite_sets.add(user_id, "planets", planet_id)
 
     return jsonify({"message": "Favorite planet added successfully"}), 201
 
     # POST Favorite People  ID
-@app.route('/favorite/people/<int:people_id>', methods=['POST'])
+@api.route('/favorite/people/<int:people_id>', methods=['POST'])
 def add_favorite_person(people_id):
     data = request.get_json()
     user_id = data.get("user_id")  # Obtener el usuario seleccionado
@@ -420,22 +578,69 @@ def add_favorite_person(people_id):
     if not person:
         return jsonify({"error": "The selected person does not exist in the database."}), 404
 
-    # Verificación de si el favorito ya existe en el usuario
-    existing_favorite = Favorite.query.filter_by(
-        user_id=user_id, people_id=people_id).first()
-    if existing_favorite:
-        return jsonify({"error": "The person is already a favorite"}), 400
-
-    # Creación del nuevo favorito
+    # Creación del nuevo favorito; el índice único (user_id, people_id)
+    # rechaza el duplicado, incluso con dos peticiones concurrentes
     new_favorite = Favorite(user_id=user_id, people_id=people_id)
     db.session.add(new_favorite)
-    db.session.commit()
+    try:
+        update_favorite_counts([(people_id, None)], 1)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "The person is already a favorite"}), 400
+
+    response_cache.invalidate("users", user_id)
+    response_cache.invalidate("favorites")
+    favorite_sets.add(user_id, "people", people_id)
 
     return jsonify({"message": "Favorite people added successfully"}), 201
 
 
+# Versión idempotente del alta de favoritos: un solo INSERT ... ON CONFLICT
+# DO NOTHING, sin comprobar antes usuario, destino ni duplicado. Repetir la
+# petición devuelve 200 sin cambiar nada; las claves foráneas responden 404
+def put_favorite(kind, people_id=None, planet_id=None):
+    data = request.get_json(silent=True) or {}
+    user_id = data.get("user_id")
+    if not isinstance(user_id, int) or isinstance(user_id, bool):
+        return jsonify({"error": "user_id must be an integer"}), 400
+
+    try:
+        favorite_id = upsert_favorite(user_id, people_id=people_id, planet_id=planet_id)
+        if favorite_id is not None:
+            update_favorite_counts([(people_id, planet_id)], 1)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        # Solo en el caso de error: averiguar qué referencia falta
+        if db.session.get(User, user_id) is None:
+            return jsonify({"error": "The selected user does not exist in the database."}), 404
+        return jsonify({"error": "The selected %s does not exist in the database." % kind}), 404
+
+    if favorite_id is None:
+        return jsonify({"message": "Favorite %s already exists" % kind, "created": False}), 200
+
+    response_cache.invalidate("users", user_id)
+    response_cache.invalidate("favorites")
+    if people_id is not None:
+        favorite_sets.add(user_id, "people", people_id)
+    else:
+        favorite_sets.add(user_id, "planets", planet_id)
+    return jsonify({"message": "Favorite %s added successfully" % kind, "id": favorite_id, "created": True}), 201
+
+    # PUT Favorite Planet ID
+@api.route('/favorite/planet/<int:planet_id>', methods=['PUT'])
+def put_favorite_planet(planet_id):
+    return put_favorite("planet", planet_id=planet_id)
+
+    # PUT Favorite People ID
+@api.route('/favorite/people/<int:people_id>', methods=['PUT'])
+def put_favorite_person(people_id):
+    return put_favorite("person", people_id=people_id)
+
+
     # DELETE Favorite Planet ID
-@app.route("/favorite/planet/<int:planet_id>", methods=["DELETE"])
+@api.route("/favorite/planet/<int:planet_id>", methods=["DELETE"])
 def delete_favorite_planet(planet_id):
     # Verificar si el favorito existe
     favorite = Favorite.query.filter_by(planet_id=planet_id).first()
@@ -443,9 +648,15 @@ def delete_favorite_planet(planet_id):
         return jsonify({"error": "Favorite planet not found"}), 404
 
     try:
-        # Eliminar el favorito
-        db.session.delete(favorite)
+        # Eliminar el favorito: solo se descuenta si este DELETE lo borró
+        # (otra petición pudo borrarlo antes)
+        if not delete_favorites(Favorite.id == favorite.id):
+            db.session.rollback()
+            return jsonify({"error": "Favorite planet not found"}), 404
         db.session.commit()
+        response_cache.invalidate("users", favorite.user_id)
+        response_cache.invalidate("favorites")
+        favorite_sets.discard(favorite.user_id, "planets", planet_id)
 
         return jsonify({"message": "Favorite planet deleted successfully"}), 200
     except Exception as e:
@@ -453,7 +664,7 @@ def delete_favorite_planet(planet_id):
         return jsonify({"error": str(e)}), 500
 
     # DELETE Favorite People ID
-@app.route("/favorite/people/<int:people_id>", methods=["DELETE"])
+@api.route("/favorite/people/<int:people_id>", methods=["DELETE"])
 def delete_favorite_people(people_id):
     # Verificar si el favorito existe
     favorite = Favorite.query.filter_by(people_id=people_id).first()
@@ -461,11 +672,402 @@ def delete_favorite_people(people_id):
         return jsonify({"error": "Favorite people not found"}), 404
 
     try:
-        # Eliminar el favorito
-        db.session.delete(favorite)
+        # Eliminar el favorito: solo se descuenta si este DELETE lo borró
+        # (otra petición pudo borrarlo antes)
+        if not delete_favorites(Favorite.id == favorite.id):
+            db.session.rollback()
+            return jsonify({"error": "Favorite people not found"}), 404
         db.session.commit()
+        response_cache.invalidate("users", favorite.user_id)
+        response_cache.invalidate("favorites")
+        favorite_sets.discard(favorite.user_id, "people", people_id)
 
         return jsonify({"message": "Favorite people deleted successfully"}), 200
     except Exception as e:
         db.session.rollback()  # Revertir cambios en caso de error
         return jsonify({"error": str(e)}), 500
+
+
+# **Leaderboard Methods** ------------------------------------------------->
+# Los más favoritos, servidos desde favorite_count y su índice
+# (favorite_count, id) recorrido de mayor a menor: sin GROUP BY sobre favorites
+
+def leaderboard(model, columns):
+    # Ordenado por contador: el cursor guarda el desplazamiento
+    limit, offset = get_page_args()
+    offset = offset or 0
+    rows = db.session.execute(
+        select(*columns).where(model.favorite_count > 0)
+        .order_by(model.favorite_count.desc(), model.id.desc())
+        .limit(limit + 1).offset(offset)).all()
+    next_cursor = encode_cursor(offset + limit) if len(rows) > limit else None
+    return jsonify(page_response([serialize_row(row) for row in rows[:limit]], next_cursor)), 200
+
+    # GET Ranking de People
+@api.route("/leaderboard/people", methods=["GET"])
+@response_cache.conditional("people", depends_on=("favorites",), store=True)
+def get_people_leaderboard():
+    return leaderboard(People, PEOPLE_LEADERBOARD_COLUMNS)
+
+    # GET Ranking de Planetas
+@api.route("/leaderboard/planets", methods=["GET"])
+@response_cache.conditional("planets", depends_on=("favorites",), store=True)
+def get_planets_leaderboard():
+    return leaderboard(Planet, PLANET_LEADERBOARD_COLUMNS)
+
+
+# **Search Methods** ------------------------------------------------->
+# Búsqueda por nombre sobre índices de trigramas (Postgres) o FTS5 (SQLite),
+# ver search.py
+
+def get_name_prefix(args=None):
+    if args is None:
+        args = request.args
+    prefix = args.get("name_prefix", "")
+    if len(prefix) > MAX_QUERY_LENGTH:
+        raise APIException("name_prefix is too long", status_code=400)
+    return prefix
+
+    # GET Búsqueda en people y planets
+@api.route("/search", methods=["GET"])
+@response_cache.conditional("people", depends_on=("planets",), store=True)
+def search_names():
+    q = request.args.get("q", "").strip()
+    if not q:
+        return jsonify({"error": "q is required"}), 400
+    if len(q) > MAX_QUERY_LENGTH:
+        return jsonify({"error": "q is too long"}), 400
+    collections = get_list_arg("type", SEARCH_COLLECTIONS)
+
+    # Los resultados van por relevancia: el cursor guarda el desplazamiento
+    limit, offset = get_page_args()
+    offset = offset or 0
+    rows, has_more = search(q, collections, limit, offset)
+    results = [{"type": row.type, "id": row.id, "name": row.name} for row in rows]
+    return jsonify(page_response(results, encode_cursor(offset + limit) if has_more else None)), 200
+
+
+# **Export Methods** ------------------------------------------------->
+# Exporta colecciones completas como NDJSON: las filas se leen con un cursor
+# del lado del servidor (yield_per) y se envían apenas se serializan
+
+EXPORT_BATCH_SIZE = 1000
+
+# (consulta, serialización de cada fila): people y planets se leen como
+# tuplas de columnas y se serializan sin construir objetos ORM
+EXPORT_QUERIES = {
+    "people": (select(*PEOPLE_COLUMNS).order_by(People.id), serialize_row),
+    "planets": (select(*PLANET_COLUMNS).order_by(Planet.id), serialize_row),
+    "users": (select(User).options(*USER_LOAD).order_by(User.id), lambda row: row.User.serialize()),
+}
+
+    # GET Export Coleccion
+@api.route("/export/<collection>", methods=["GET"])
+def export_collection(collection):
+    if collection not in EXPORT_QUERIES:
+        return jsonify({"error": "Collection not found"}), 404
+    query, serialize = EXPORT_QUERIES[collection]
+
+    def generate():
+        rows = db.session.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for row in rows:
+            yield current_app.json.dumps(serialize(row)) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+# **Bulk Methods** ------------------------------------------------->
+# Cada petición valida todos los elementos en una pasada, detecta duplicados
+# con una sola consulta IN y escribe todo en una única transacción
+
+def is_valid_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def bulk_create_by_name(model, exists_error):
+    items = get_bulk_items()
+    results = [None] * len(items)
+
+    # Validación de los datos y de duplicados dentro de la misma petición
+    pending = {}
+    for index, item in enumerate(items):
+        name = item.get("name") if isinstance(item, dict) else None
+        if not name or not isinstance(name, str):
+            results[index] = bulk_error(index, "Missing or invalid data")
+        elif name in pending:
+            results[index] = bulk_error(index, "Duplicate name in request")
+        else:
+            pending[name] = index
+
+    # Duplicados ya guardados en la BD
+    if pending:
+        existing = db.session.scalars(select(model.name).where(model.name.in_(pending))).all()
+        for name in existing:
+            index = pending.pop(name)
+            results[index] = bulk_error(index, exists_error)
+
+    if pending:
+        try:
+            # Sin sort_by_parameter_order el INSERT va en lotes de varias
+            # filas; cada fila se relaciona con su elemento por el nombre
+            created = db.session.execute(
+                insert(model).returning(model.id, model.name),
+                [{"name": name} for name in pending]).all()
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({"error": exists_error}), 400
+
+        response_cache.invalidate(model.__tablename__)
+        for row in created:
+            index = pending[row.name]
+            results[index] = {"index": index, "status": "created", "id": row.id, "name": row.name}
+
+    return jsonify(bulk_response(results)), 200
+
+def bulk_update_by_name(model, exists_error, not_found_error):
+    items = get_bulk_items()
+    results = [None] * len(items)
+
+    pending = {}
+    names = {}
+    for index, item in enumerate(items):
+        item_id = item.get("id") if isinstance(item, dict) else None
+        name = item.get("name") if isinstance(item, dict) else None
+        if not is_valid_id(item_id) or not name or not isinstance(name, str):
+            results[index] = bulk_error(index, "Missing or invalid data")
+        elif item_id in pending:
+            results[index] = bulk_error(index, "Duplicate id in request")
+        elif name in names:
+            results[index] = bulk_error(index, "Duplicate name in request")
+        else:
+            pending[item_id] = index
+            names[name] = item_id
+
+    if pending:
+        found = set(db.session.scalars(select(model.id).where(model.id.in_(pending))).all())
+        taken = db.session.execute(
+            select(model.id, model.name).where(model.name.in_(names))).all()
+        for item_id in set(pending) - found:
+            index = pending.pop(item_id)
+            results[index] = bulk_error(index, not_found_error)
+        for row in taken:
+            item_id = names[row.name]
+            if row.id != item_id and item_id in pending:
+                index = pending.pop(item_id)
+                results[index] = bulk_error(index, exists_error)
+
+    if pending:
+        rows = [{"id": item_id, "name": items[index]["name"]} for item_id, index in pending.items()]
+        try:
+            db.session.execute(update(model), rows)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({"error": exists_error}), 400
+
+        response_cache.invalidate(model.__tablename__, *pending)
+        for row in rows:
+            index = pending[row["id"]]
+            results[index] = {"index": index, "status": "updated", "id": row["id"], "name": row["name"]}
+
+    return jsonify(bulk_response(results)), 200
+
+def bulk_delete_by_id(model, not_found_error, owner_column=None):
+    items = get_bulk_items()
+    results = [None] * len(items)
+
+    pending = {}
+    for index, item_id in enumerate(items):
+        if not is_valid_id(item_id):
+            results[index] = bulk_error(index, "Missing or invalid data")
+        elif item_id in pending:
+            results[index] = bulk_error(index, "Duplicate id in request")
+        else:
+            pending[item_id] = index
+
+    if pending:
+        try:
+            # Favoritos de estas filas que cuentan para otras (los de un
+            # usuario): bloquear las filas antes de borrar y descontarlos
+            if owner_column is not None:
+                db.session.execute(select(model.id).where(model.id.in_(pending)).with_for_update())
+                subtract_favorite_counts(owner_column.in_(pending))
+
+            # Un solo DELETE: la BD borra los favoritos en cascada y RETURNING
+            # dice qué ids existían
+            found = set(db.session.scalars(
+                delete(model).where(model.id.in_(pending)).returning(model.id)).all())
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({"error": str(e)}), 500
+
+        for item_id in set(pending) - found:
+            index = pending.pop(item_id)
+            results[index] = bulk_error(index, not_found_error)
+
+    if pending:
+        response_cache.invalidate(model.__tablename__, *pending)
+        response_cache.invalidate("favorites")
+        if owner_column is not None:
+            favorite_sets.invalidate(*pending)
+        else:
+            favorite_sets.invalidate_targets()
+
+        for item_id, index in pending.items():
+            results[index] = {"index": index, "status": "deleted", "id": item_id}
+
+    return jsonify(bulk_response(results)), 200
+
+    # DELETE Usuarios Bulk
+@api.route("/users/bulk", methods=["DELETE"])
+def delete_users_bulk():
+    return bulk_delete_by_id(User, "User not found", owner_column=Favorite.user_id)
+
+    # POST People Bulk
+@api.route("/people/bulk", methods=["POST"])
+def create_people_bulk():
+    return bulk_create_by_name(People, "Person already exists")
+
+    # PUT People Bulk
+@api.route("/people/bulk", methods=["PUT"])
+def update_people_bulk():
+    return bulk_update_by_name(People, "Person already exists", "People not found")
+
+    # DELETE People Bulk
+@api.route("/people/bulk", methods=["DELETE"])
+def delete_people_bulk():
+    return bulk_delete_by_id(People, "People not found")
+
+    # POST Planetas Bulk
+@api.route("/planets/bulk", methods=["POST"])
+def create_planets_bulk():
+    return bulk_create_by_name(Planet, "Planet already exists")
+
+    # PUT Planetas Bulk
+@api.route("/planets/bulk", methods=["PUT"])
+def update_planets_bulk():
+    return bulk_update_by_name(Planet, "Planet already exists", "Planet not found")
+
+    # DELETE Planetas Bulk
+@api.route("/planets/bulk", methods=["DELETE"])
+def delete_planets_bulk():
+    return bulk_delete_by_id(Planet, "Planet not found")
+
+    # POST Favoritos Bulk
+@api.route("/favorites/bulk", methods=["POST"])
+def create_favorites_bulk():
+    items = get_bulk_items()
+    results = [None] * len(items)
+
+    # Cada favorito es {"user_id", "people_id"} o {"user_id", "planet_id"}
+    pending = {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[index] = bulk_error(index, "Missing or invalid data")
+            continue
+        user_id = item.get("user_id")
+        people_id = item.get("people_id")
+        planet_id = item.get("planet_id")
+        if not is_valid_id(user_id) or (people_id is None) == (planet_id is None) \
+                or not is_valid_id(people_id if planet_id is None else planet_id):
+            results[index] = bulk_error(index, "Missing or invalid data")
+            continue
+        key = (user_id, people_id, planet_id)
+        if key in pending:
+            results[index] = bulk_error(index, "Duplicate favorite in request")
+        else:
+            pending[key] = index
+
+    if pending:
+        user_ids = {key[0] for key in pending}
+        people_ids = {key[1] for key in pending if key[1] is not None}
+        planet_ids = {key[2] for key in pending if key[2] is not None}
+
+        # Existencia de usuarios, personas y planetas: una consulta por tabla
+        found_users = set(db.session.scalars(select(User.id).where(User.id.in_(user_ids))).all())
+        found_people = set(db.session.scalars(select(People.id).where(People.id.in_(people_ids))).all()) \
+            if people_ids else set()
+        found_planets = set(db.session.scalars(select(Planet.id).where(Planet.id.in_(planet_ids))).all()) \
+            if planet_ids else set()
+
+        # Favoritos ya guardados en una sola consulta
+        existing = set(tuple(row) for row in db.session.execute(
+            select(Favorite.user_id, Favorite.people_id, Favorite.planet_id).where(
+                Favorite.user_id.in_(user_ids),
+                or_(Favorite.people_id.in_(people_ids), Favorite.planet_id.in_(planet_ids)))).all())
+
+        for key in list(pending):
+            user_id, people_id, planet_id = key
+            if user_id not in found_users:
+                error = "The selected user does not exist in the database."
+            elif people_id is not None and people_id not in found_people:
+                error = "The selected person does not exist in the database."
+            elif planet_id is not None and planet_id not in found_planets:
+                error = "The selected planet does not exist in the database."
+            elif key in existing:
+                error = "The favorite is already a favorite"
+            else:
+                continue
+            index = pending.pop(key)
+            results[index] = bulk_error(index, error)
+
+    if pending:
+        try:
+            created = db.session.execute(
+                insert(Favorite).returning(Favorite.id, Favorite.user_id, Favorite.people_id, Favorite.planet_id),
+                [{"user_id": key[0], "people_id": key[1], "planet_id": key[2]} for key in pending]).all()
+            update_favorite_counts([(key[1], key[2]) for key in pending], 1)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({"error": "The favorite is already a favorite"}), 400
+
+        response_cache.invalidate("users", *{key[0] for key in pending})
+        response_cache.invalidate("favorites")
+        favorite_sets.invalidate(*{key[0] for key in pending})
+        for row in created:
+            index = pending[(row.user_id, row.people_id, row.planet_id)]
+            results[index] = {"index": index, "status": "created", "id": row.id}
+
+    return jsonify(bulk_response(results)), 200
+
+    # DELETE Favoritos Bulk
+@api.route("/favorites/bulk", methods=["DELETE"])
+def delete_favorites_bulk():
+    items = get_bulk_items()
+    results = [None] * len(items)
+
+    pending = {}
+    for index, item_id in enumerate(items):
+        if not is_valid_id(item_id):
+            results[index] = bulk_error(index, "Missing or invalid data")
+        elif item_id in pending:
+            results[index] = bulk_error(index, "Duplicate id in request")
+        else:
+            pending[item_id] = index
+
+    if pending:
+        # Un solo DELETE ... RETURNING: los contadores y los usuarios a
+        # invalidar salen de las filas que borró de verdad, no de un SELECT
+        # previo (otra petición pudo borrar alguna antes)
+        try:
+            found = {row.id: row for row in delete_favorites(Favorite.id.in_(pending))}
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({"error": str(e)}), 500
+
+        for item_id in set(pending) - set(found):
+            index = pending.pop(item_id)
+            results[index] = bulk_error(index, "Favorite not found")
+
+    if pending:
+        response_cache.invalidate("users", *{row.user_id for row in found.values()})
+        response_cache.invalidate("favorites")
+        favorite_sets.invalidate(*{row.user_id for row in found.values()})
+        for item_id, index in pending.items():
+            results[index] = {"index": index, "status": "deleted", "id": item_id}
+
+    return jsonify(bulk_response(results)), 200
+
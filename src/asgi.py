@@ -0,0 +1,255 @@
+# ASGI entry point, the async counterpart of wsgi.py:
+#
+#     uvicorn asgi:application --app-dir src
+#
+# The read endpoints of app.py are served by async handlers on an async
+# SQLAlchemy engine (asyncpg on Postgres, aiosqlite on SQLite), so a worker
+# keeps serving other requests while it waits on the database. Every other
+# route (writes, bulk, export, admin) is handed to the Flask app unchanged,
+# on a pool of ASGI_WSGI_THREADS threads (10), so a slow request there (an
+# export, a login hashing its password) does not hold up the others.
+# ETags come from the same version counters as the Flask handlers and
+# responses are compressed the same way (compress.py); only the compressed
+# bytes are cached on this path, not the JSON bodies.
+
+import os
+import re
+from urllib.parse import parse_qsl
+
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import parse_accept_header
+
+from app import (create_app, response_cache, response_compressor, USER_DEPENDS_ON, get_user_view_args,
+                 get_name_prefix)
+from models import (User, Profile, People, Planet, USER_FAVORITES_LOAD, user_load_options,
+                    PEOPLE_COLUMNS, PLANET_COLUMNS, serialize_row)
+from search import name_prefix_filter
+from utils import APIException, get_page_args, split_page, page_response, get_ids_arg, ids_response
+
+
+def async_database_url(url):
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
+
+def async_engine_options(options):
+    # Mismo dimensionado que el motor síncrono, adaptado a los drivers async
+    options = dict(options)
+    options.pop("poolclass", None)
+    connect_args = options.pop("connect_args", {})
+    if "options" in connect_args:
+        timeout = connect_args["options"].split("=", 1)[1]
+        options["connect_args"] = {"server_settings": {"statement_timeout": timeout}}
+    return options
+
+
+flask_app = create_app()
+
+engine = create_async_engine(
+    async_database_url(flask_app.config["SQLALCHEMY_DATABASE_URI"]),
+    **async_engine_options(flask_app.config["SQLALCHEMY_ENGINE_OPTIONS"]))
+Session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+async def paginate(session, query, column, args):
+    limit, after = get_page_args(args)
+    if after is not None:
+        query = query.where(column > after)
+    rows = (await session.scalars(query.order_by(column).limit(limit + 1))).all()
+    return split_page(rows, limit)
+
+
+async def paginate_rows(session, query, column, args):
+    # Igual que paginate, pero devuelve filas de columnas en vez de entidades
+    limit, after = get_page_args(args)
+    if after is not None:
+        query = query.where(column > after)
+    rows = (await session.execute(query.order_by(column).limit(limit + 1))).all()
+    return split_page(rows, limit)
+
+
+# **Async Read Methods** ------------------------------------------------->
+
+async def get_users(session, args):
+    fields, expand = get_user_view_args(args)
+    query = select(User).options(*user_load_options(expand))
+    ids = get_ids_arg(args)
+    if ids is not None:
+        users = (await session.scalars(query.where(User.id.in_(ids)))).all()
+        return 200, ids_response({user.id: user.serialize(fields, expand) for user in users}, ids)
+    users, next_cursor = await paginate(session, query, User.id, args)
+    return 200, page_response([user.serialize(fields, expand) for user in users], next_cursor)
+
+async def get_user(session, args, user_id):
+    fields, expand = get_user_view_args(args)
+    user = await session.get(User, user_id, options=user_load_options(expand))
+    if not user:
+        return 404, {"error": "User not found"}
+    return 200, user.serialize(fields, expand)
+
+async def get_profiles(session, args):
+    profiles, next_cursor = await paginate(session, select(Profile), Profile.id, args)
+    return 200, page_response([p.serialize() for p in profiles], next_cursor)
+
+async def get_profile(session, args, profile_id):
+    profile = await session.get(Profile, profile_id)
+    if not profile:
+        return 404, {"error": "Profile not found"}
+    return 200, profile.serialize()
+
+async def get_people(session, args):
+    ids = get_ids_arg(args)
+    if ids is not None:
+        rows = (await session.execute(select(*PEOPLE_COLUMNS).where(People.id.in_(ids)))).all()
+        return 200, ids_response({row.id: serialize_row(row) for row in rows}, ids)
+    query = select(*PEOPLE_COLUMNS)
+    prefix = get_name_prefix(args)
+    if prefix:
+        query = query.where(name_prefix_filter(People, prefix, engine.dialect.name))
+    rows, next_cursor = await paginate_rows(session, query, People.id, args)
+    return 200, page_response([serialize_row(row) for row in rows], next_cursor)
+
+async def get_person(session, args, people_id):
+    person = await session.get(People, people_id)
+    if not person:
+        return 404, {"error": "Person not found"}
+    return 200, person.serialize()
+
+async def get_planets(session, args):
+    ids = get_ids_arg(args)
+    if ids is not None:
+        rows = (await session.execute(select(*PLANET_COLUMNS).where(Planet.id.in_(ids)))).all()
+        return 200, ids_response({row.id: serialize_row(row) for row in rows}, ids)
+    query = select(*PLANET_COLUMNS)
+    prefix = get_name_prefix(args)
+    if prefix:
+        query = query.where(name_prefix_filter(Planet, prefix, engine.dialect.name))
+    rows, next_cursor = await paginate_rows(session, query, Planet.id, args)
+    return 200, page_response([serialize_row(row) for row in rows], next_cursor)
+
+async def get_planet(session, args, planet_id):
+    planet = await session.get(Planet, planet_id)
+    if not planet:
+        return 404, {"error": "Planet not found"}
+    return 200, planet.serialize()
+
+async def get_users_with_favorites(session, args):
+    query = select(User).where(User.favorites.any()).options(*USER_FAVORITES_LOAD)
+    users, next_cursor = await paginate(session, query, User.id, args)
+    users_with_favorites = [{
+        "user_id": user.id,
+        "email": user.email,
+        "favorites": [fav.serialize() for fav in user.favorites]
+    } for user in users]
+    if not users_with_favorites:
+        return 200, {"message": "No users with favorites found"}
+    return 200, page_response(users_with_favorites, next_cursor)
+
+
+# (patrón, handler, colección para el ETag, dependencias del ETag)
+ROUTES = [
+    (re.compile(r"/users/?"), get_users, "users", USER_DEPENDS_ON),
+    (re.compile(r"/users/favorites/?"), get_users_with_favorites, None, ()),
+    (re.compile(r"/users/(\d+)/?"), get_user, "users", USER_DEPENDS_ON),
+    (re.compile(r"/profiles/?"), get_profiles, None, ()),
+    (re.compile(r"/profiles/(\d+)/?"), get_profile, None, ()),
+    (re.compile(r"/people/?"), get_people, "people", ()),
+    (re.compile(r"/people/(\d+)/?"), get_person, "people", ()),
+    (re.compile(r"/planets/?"), get_planets, "planets", ()),
+    (re.compile(r"/planets/(\d+)/?"), get_planet, "planets", ()),
+]
+
+
+def json_body(body):
+    return flask_app.json.dumps(body).encode() + b"\n" if body is not None else b""
+
+
+async def send_json(send, status, body, headers=()):
+    await send_body(send, status, json_body(body), headers)
+
+
+async def send_body(send, status, body, headers=()):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode())] + list(headers),
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def handle(scope, send, handler, match, namespace, depends_on):
+    args = MultiDict(parse_qsl(scope["query_string"].decode()))
+    item_id = int(match.group(1)) if match.groups() else None
+
+    request_headers = dict(scope["headers"])
+    etag = None
+    if namespace and response_cache.backend is not None:
+        etag = response_cache.etag(namespace, item_id, depends_on)
+        # También las variantes comprimidas: "<etag>:<encoding>"
+        if_none_match = request_headers.get(b"if-none-match", b"").decode()
+        for tag in [tag.strip() for tag in if_none_match.split(",")]:
+            if tag == "*" or tag == '"%s"' % etag or tag.startswith('"%s:' % etag):
+                matched = '"%s"' % etag if tag == "*" else tag
+                return await send_json(send, 304, None, [(b"etag", matched.encode())])
+
+    try:
+        async with Session() as session:
+            if item_id is None:
+                status, body = await handler(session, args)
+            else:
+                status, body = await handler(session, args, item_id)
+    except APIException as error:
+        return await send_json(send, error.status_code, error.to_dict())
+
+    if status != 200:
+        return await send_json(send, status, body)
+
+    body = json_body(body)
+    headers = []
+    if response_compressor is not None:
+        headers.append((b"vary", b"Accept-Encoding"))
+        accept_encodings = parse_accept_header(request_headers.get(b"accept-encoding", b"").decode())
+        encoding = response_compressor.negotiate(accept_encodings, len(body))
+        if encoding is not None:
+            path = "%s?%s" % (scope["path"], scope["query_string"].decode())
+            body, etag = response_compressor.compress(body, encoding, etag, path)
+            headers.append((b"content-encoding", encoding.encode()))
+    if etag is not None:
+        headers.append((b"etag", ('"%s"' % etag).encode()))
+    await send_body(send, status, body, headers)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await engine.dispose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+# asgiref.WsgiToAsgi atiende todo en un único hilo por proceso: una
+# exportación larga bloquearía el resto de rutas de Flask
+wsgi_application = WSGIMiddleware(flask_app, workers=int(os.getenv("ASGI_WSGI_THREADS", 10)))
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+
+    if scope["type"] == "http" and scope["method"] == "GET":
+        for pattern, handler, namespace, depends_on in ROUTES:
+            match = pattern.fullmatch(scope["path"])
+            if match:
+                return await handle(scope, send, handler, match, namespace, depends_on)
+
+    await wsgi_application(scope, receive, send)
@@ -0,0 +1,317 @@
+"""
+Read-through response cache and conditional GET support.
+
+Responses are cached by route and query arguments. Every key carries a
+version counter (one per collection for listings, one per row for single
+items); writes bump the counters of exactly the rows and collection they
+touched, so a cached read can never outlive a committed write. The same
+counters are sent as strong ETags, so answering If-None-Match with a 304
+needs neither a database query nor serialization.
+
+Counters never expire and are not evicted with the cached bodies, so an
+ETag only changes when the data does. Reads never create them: a row that
+was never written reads the backend's epoch, a single value taken from the
+wall clock in nanoseconds, and only bump() stores a counter (from the
+epoch on). Requests for ids that do not exist therefore store nothing, and
+when the counters are lost (a Redis restart) the new epoch is newer than
+any of them, never a repeated value.
+
+The in-process backend only sees the writes of its own process, so it is
+only used with a single worker: with WEB_CONCURRENCY above 1 (the worker
+count gunicorn reads) and CACHE_BACKEND=memory, caching and version ETags
+are disabled. Use the shared backend when running several workers.
+
+MembershipCache keeps per-user id sets (favorite people and planets) on the
+same backends, updated write-through by the handlers that change them.
+
+Backends:
+    MemoryCache  in-process LRU with TTL, the default
+    RedisCache   shared between workers, wraps any client with the redis-py
+                 interface (a local stand-in such as fakeredis works too)
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import current_app, request
+
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryCache:
+    def __init__(self, max_entries=1024, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        # Contadores de versión: sin TTL ni LRU, solo de filas escritas
+        # (bump); las demás leen la época
+        self._versions = {}
+        self._epoch = time.time_ns()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            return self._get(key)
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._set(key, value, ttl)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def version(self, key):
+        with self._lock:
+            return self._versions.get(key, self._epoch)
+
+    def bump(self, key):
+        with self._lock:
+            value = self._versions[key] = self._versions.get(key, self._epoch) + 1
+            return value
+
+
+class RedisCache:
+    def __init__(self, client, ttl=60, prefix="swapi:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, value, ex=self.ttl if ttl is None else ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+    # Las claves version: no llevan TTL: la ETag solo cambia con una escritura
+    def _epoch(self):
+        key = self.prefix + "version-epoch"
+        self.client.set(key, time.time_ns(), nx=True)
+        return int(self.client.get(key))
+
+    def version(self, key):
+        # Una sola clave persistente para todo lo que nunca se escribió
+        value, epoch = self.client.mget(self.prefix + "version:" + key, self.prefix + "version-epoch")
+        if value is not None:
+            return int(value)
+        return int(epoch) if epoch is not None else self._epoch()
+
+    def bump(self, key):
+        key = self.prefix + "version:" + key
+        self.client.set(key, self._epoch(), nx=True)
+        return int(self.client.incr(key))
+
+
+def cache_from_env():
+    """
+    Builds the backend selected by CACHE_BACKEND (memory, redis or none).
+    """
+    backend = os.getenv("CACHE_BACKEND", "memory")
+    ttl = int(os.getenv("CACHE_TTL", 60))
+    if backend == "none":
+        return None
+    if backend == "redis":
+        import redis
+        return RedisCache(redis.Redis.from_url(os.getenv("CACHE_URL", "redis://localhost:6379/0")), ttl=ttl)
+    if backend == "memory":
+        if int(os.getenv("WEB_CONCURRENCY", 1)) > 1:
+            # Cada worker tendría sus propios contadores: ETags distintas
+            # para los mismos datos y 304 con datos de otro worker
+            logger.warning("CACHE_BACKEND=memory with WEB_CONCURRENCY > 1: response cache disabled, "
+                           "use CACHE_BACKEND=redis")
+            return None
+        return MemoryCache(max_entries=int(os.getenv("CACHE_MAX_ENTRIES", 1024)), ttl=ttl)
+    raise ValueError("Unknown CACHE_BACKEND: %s" % backend)
+
+
+def matching_etag(etag):
+    """
+    The tag of If-None-Match that matches etag, counting the variants of
+    compressed responses ("<etag>:<encoding>", see compress.py), or None.
+    """
+    if_none_match = request.if_none_match
+    if if_none_match.star_tag:
+        return etag
+    for tag in if_none_match:
+        if tag == etag or tag.startswith(etag + ":"):
+            return tag
+    return None
+
+
+class ResponseCache:
+    def __init__(self, backend=None):
+        self.backend = backend
+
+    def etag(self, namespace, item_id=None, depends_on=()):
+        keys = [namespace if item_id is None else "%s:%s" % (namespace, item_id)]
+        keys.extend(depends_on)
+        return "-".join(str(self.backend.version(key)) for key in keys)
+
+    def key(self, namespace, item_id, etag):
+        if item_id is not None:
+            return "%s:item:%s:%s" % (namespace, item_id, etag)
+        args = urlencode(sorted(request.args.items(multi=True)))
+        return "%s:list:%s:%s?%s" % (namespace, etag, request.path, args)
+
+    def conditional(self, namespace, id_arg=None, depends_on=(), store=False):
+        """
+        Sends a version based ETag with successful responses of a view and
+        answers a matching If-None-Match with 304 before calling it. With
+        id_arg the view serves a single row, identified by that URL
+        argument; depends_on lists other collections the payload embeds.
+        With store the response body is cached as well.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                if self.backend is None:
+                    return view(**kwargs)
+
+                # La versión se lee antes que la BD: si una escritura entra
+                # en medio, la respuesta queda bajo una versión vieja
+                item_id = kwargs[id_arg] if id_arg else None
+                etag = self.etag(namespace, item_id, depends_on)
+                matched = matching_etag(etag)
+                if matched is not None:
+                    response = current_app.response_class(status=304)
+                    response.set_etag(matched)
+                    return response
+
+                key = self.key(namespace, item_id, etag) if store else None
+                body = self.backend.get(key) if store else None
+                if body is not None:
+                    response = current_app.response_class(body, mimetype="application/json")
+                else:
+                    response = current_app.make_response(view(**kwargs))
+                    if store and response.status_code == 200:
+                        self.backend.set(key, response.get_data())
+
+                if response.status_code == 200:
+                    response.set_etag(etag)
+                return response
+            return wrapper
+        return decorator
+
+    def cached(self, namespace, id_arg=None):
+        """
+        Caches successful JSON responses of a view, see conditional.
+        """
+        return self.conditional(namespace, id_arg, store=True)
+
+    def invalidate(self, namespace, *item_ids):
+        """
+        Call after committing a write to the given rows of a collection.
+        """
+        if self.backend is None:
+            return
+        for item_id in item_ids:
+            self.backend.bump("%s:%s" % (namespace, item_id))
+        self.backend.bump(namespace)
+
+
+class MembershipCache:
+    """
+    Per-user sets of ids (favorite people and planets) kept in a cache
+    backend, so membership checks need no query.
+
+    Entries are stored under the user's version counter and a shared
+    "targets" counter. add() and discard() are write-through: they bump the
+    user's counter and copy the previous entry, with the change applied,
+    under the new one; set operations are idempotent, so an entry loaded
+    concurrently with the write is still correct. invalidate() drops users'
+    entries (bulk writes) and invalidate_targets() every entry (rows removed
+    from several users at once, such as cascades).
+    """
+
+    def __init__(self, backend, namespace, kinds):
+        self.backend = backend
+        self.namespace = namespace
+        self.kinds = kinds
+
+    def _key(self, user_id, version=None):
+        if version is None:
+            version = self.backend.version("%s:%s" % (self.namespace, user_id))
+        targets = self.backend.version("%s:targets" % self.namespace)
+        return "%s:sets:%s:%s:%s" % (self.namespace, user_id, version, targets)
+
+    def _decode(self, value):
+        if value is None:
+            return None
+        return {kind: set(ids) for kind, ids in zip(self.kinds, json.loads(value))}
+
+    def _encode(self, sets):
+        return json.dumps([sorted(sets[kind]) for kind in self.kinds])
+
+    def get(self, user_id, load):
+        """
+        The user's sets as {kind: set of ids}; on a miss load() returns them
+        from the database (None when the user does not exist, not cached).
+        """
+        if self.backend is None:
+            return load()
+        key = self._key(user_id)
+        sets = self._decode(self.backend.get(key))
+        if sets is None:
+            sets = load()
+            if sets is not None:
+                self.backend.set(key, self._encode(sets))
+        return sets
+
+    def _write_through(self, user_id, kind, target_id, change):
+        version = self.backend.bump("%s:%s" % (self.namespace, user_id))
+        sets = self._decode(self.backend.get(self._key(user_id, version - 1)))
+        if sets is not None:
+            change(sets[kind], target_id)
+            self.backend.set(self._key(user_id, version), self._encode(sets))
+
+    def add(self, user_id, kind, target_id):
+        """
+        Call after committing a new member.
+        """
+        if self.backend is not None:
+            self._write_through(user_id, kind, target_id, set.add)
+
+    def discard(self, user_id, kind, target_id):
+        """
+        Call after committing the removal of a member.
+        """
+        if self.backend is not None:
+            self._write_through(user_id, kind, target_id, set.discard)
+
+    def invalidate(self, *user_ids):
+        if self.backend is not None:
+            for user_id in user_ids:
+                self.backend.bump("%s:%s" % (self.namespace, user_id))
+
+    def invalidate_targets(self):
+        if self.backend is not None:
+            self.backend.bump("%s:targets" % self.namespace)
@@ -0,0 +1,154 @@
+"""
+Response compression negotiated with Accept-Encoding:
+
+    zstd   zstandard package (optional)
+    br     brotli package (optional)
+    gzip   standard library
+
+Encodings whose package is not installed are not offered. Among the ones
+the client accepts, the highest q value wins and ties go to the order
+above. Only JSON and text responses of at least COMPRESSION_MIN_SIZE bytes
+are compressed; streamed responses (exports) are sent as they are.
+
+Responses with an ETag (the cached catalog routes, see cache.py) get one
+per encoding, "<etag>:<encoding>", and their compressed bytes are kept in
+the response cache backend under that tag and the URL, so a popular
+payload is compressed once per version instead of on every request.
+
+    COMPRESSION            enable compression (1)
+    COMPRESSION_MIN_SIZE   smallest body compressed, in bytes (1024)
+    COMPRESSION_LEVEL      level for every encoding; by default gzip 6,
+                           br 4 and zstd 3, which trade little size for
+                           much less CPU than their maximums
+"""
+import gzip
+import os
+
+from flask import request
+
+from pool import env_flag
+
+DEFAULT_LEVELS = {"zstd": 3, "br": 4, "gzip": 6}
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def gzip_compressor(level):
+    return lambda data: gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def brotli_compressor(level):
+    import brotli
+    return lambda data: brotli.compress(data, quality=level)
+
+
+def zstd_compressor(level):
+    import zstandard
+    compressor = zstandard.ZstdCompressor(level=level)
+    return compressor.compress
+
+
+COMPRESSOR_FACTORIES = {"zstd": zstd_compressor, "br": brotli_compressor, "gzip": gzip_compressor}
+
+
+def available_compressors(level=None):
+    """
+    {encoding: compress(bytes) -> bytes} for the encodings that can be used,
+    in order of preference.
+    """
+    compressors = {}
+    for encoding, factory in COMPRESSOR_FACTORIES.items():
+        try:
+            compressors[encoding] = factory(DEFAULT_LEVELS[encoding] if level is None else level)
+        except ImportError:
+            pass
+    return compressors
+
+
+def is_compressible(response):
+    return (response.status_code == 200 and not response.is_streamed
+            and "Content-Encoding" not in response.headers
+            and response.mimetype.startswith(COMPRESSIBLE_TYPES))
+
+
+class ResponseCompressor:
+    """
+    Compresses response bodies; cache is the ResponseCache backend that
+    keeps the compressed bytes of responses with an ETag (None: never kept).
+    """
+
+    def __init__(self, compressors, min_size=1024, cache=None):
+        self.compressors = compressors
+        self.min_size = min_size
+        self.cache = cache
+
+    def negotiate(self, accept_encodings, size):
+        """
+        Encoding to use for a body of size bytes, or None to send it as is.
+        """
+        if size < self.min_size:
+            return None
+        best, best_quality = None, 0
+        for encoding in self.compressors:
+            quality = accept_encodings.quality(encoding)
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def compress(self, body, encoding, etag=None, path=None):
+        """
+        (compressed body, ETag of the compressed variant). With an etag the
+        bytes are cached under the variant's tag and path (the URL with its
+        query string).
+        """
+        if etag is not None:
+            etag = "%s:%s" % (etag, encoding)
+        key = "compressed:%s:%s" % (etag, path) if etag is not None and self.cache is not None else None
+
+        compressed = self.cache.get(key) if key else None
+        if compressed is None:
+            compressed = self.compressors[encoding](body)
+            if key:
+                self.cache.set(key, compressed)
+        return compressed, etag
+
+
+def compressor_from_env(cache=None):
+    """
+    Builds the ResponseCompressor configured by the COMPRESSION variables,
+    or None when compression is disabled.
+    """
+    if not env_flag("COMPRESSION", "1"):
+        return None
+    level = int(os.getenv("COMPRESSION_LEVEL")) if os.getenv("COMPRESSION_LEVEL") else None
+    return ResponseCompressor(available_compressors(level), int(os.getenv("COMPRESSION_MIN_SIZE", 1024)), cache)
+
+
+def setup_compression(app, compressor):
+    """
+    Adds the after_request hook that compresses responses with compressor
+    (see compressor_from_env; None leaves them as they are). Call it after
+    setup_instrumentation: hooks run in reverse order, so the metrics see
+    the compressed size.
+    """
+    if compressor is None:
+        return None
+
+    @app.after_request
+    def compress_response(response):
+        if not is_compressible(response):
+            return response
+        # La respuesta depende de Accept-Encoding aunque esta vez no se comprima
+        response.vary.add("Accept-Encoding")
+        encoding = compressor.negotiate(request.accept_encodings, response.calculate_content_length())
+        if encoding is None:
+            return response
+
+        body, etag = compressor.compress(response.get_data(), encoding, response.get_etag()[0],
+                                         request.full_path)
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        if etag is not None:
+            response.set_etag(etag)
+        return response
+
+    return compressor
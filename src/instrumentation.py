@@ -0,0 +1,196 @@
+"""
+Per-request instrumentation: SQL statements run, time spent in the database,
+JSON encoding time and response size for every request.
+
+Each response carries the numbers in a Server-Timing header
+
+    Server-Timing: db;dur=3.1;desc="4 queries", json;dur=0.4, total;dur=5.2
+
+and /metrics exposes per-endpoint histograms in the Prometheus text format,
+only to scrapers that send INTERNAL_TOKEN as a bearer token (see
+utils.internal_only).
+Histograms are kept in process, so with several gunicorn workers each worker
+reports its own series (scrape them per worker or aggregate by instance).
+
+    INSTRUMENTATION   enable the hooks and /metrics (1)
+    SLOW_QUERY_MS     log statements slower than this, with the endpoint that
+                      ran them (unset: disabled)
+"""
+import logging
+import os
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from pool import env_flag
+from utils import internal_only
+
+logger = logging.getLogger("swapi.slow_query")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS")) if os.getenv("SLOW_QUERY_MS") else None
+
+# Segundos, bytes y número de consultas
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100, 250)
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.json_seconds = 0.0
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, labels, value):
+        counts = self.series.get(labels)
+        if counts is None:
+            # Un contador por bucket, más +Inf, la suma y el total
+            counts = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        counts[-3] += 1
+        counts[-2] += value
+        counts[-1] += 1
+
+    def render(self):
+        lines = ["# HELP %s %s" % (self.name, self.help_text), "# TYPE %s histogram" % self.name]
+        for labels, counts in sorted(self.series.items()):
+            label_text = format_labels(labels)
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                lines.append('%s_bucket{%s,le="%s"} %d' % (self.name, label_text, bound, count))
+            lines.append("%s_sum{%s} %s" % (self.name, label_text, repr(float(counts[-2]))))
+            lines.append("%s_count{%s} %d" % (self.name, label_text, counts[-1]))
+        return lines
+
+
+def format_labels(labels):
+    return ",".join('%s="%s"' % (key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+                    for key, value in labels)
+
+
+class Metrics:
+    def __init__(self):
+        self.requests = {}
+        self.histograms = [
+            Histogram("http_request_duration_seconds", "Time spent handling the request.", DURATION_BUCKETS),
+            Histogram("http_request_db_seconds", "Time spent in SQL statements per request.", DURATION_BUCKETS),
+            Histogram("http_request_json_seconds", "Time spent encoding JSON per request.", DURATION_BUCKETS),
+            Histogram("http_request_queries", "SQL statements run per request.", QUERY_BUCKETS),
+            Histogram("http_response_size_bytes", "Response body size.", SIZE_BUCKETS),
+        ]
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, method, status, stats, total, size):
+        labels = (("endpoint", endpoint), ("method", method))
+        with self._lock:
+            key = labels + (("status", status),)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            duration, db_time, json_time, queries, response_size = self.histograms
+            duration.observe(labels, total)
+            db_time.observe(labels, stats.db_seconds)
+            json_time.observe(labels, stats.json_seconds)
+            queries.observe(labels, stats.queries)
+            if size is not None:
+                response_size.observe(labels, size)
+
+    def render(self):
+        with self._lock:
+            lines = ["# HELP http_requests_total Requests handled.", "# TYPE http_requests_total counter"]
+            for labels, count in sorted(self.requests.items()):
+                lines.append("http_requests_total{%s} %d" % (format_labels(labels), count))
+            for histogram in self.histograms:
+                lines.extend(histogram.render())
+        return "\n".join(lines) + "\n"
+
+
+def current_stats():
+    return g.get("request_stats") if has_request_context() else None
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    elapsed = time.perf_counter() - started
+
+    stats = current_stats()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+    if SLOW_QUERY_MS is not None and elapsed * 1000 >= SLOW_QUERY_MS:
+        handler = request.endpoint if has_request_context() else None
+        logger.warning("slow query (%.1f ms) in %s: %s", elapsed * 1000, handler or "-", statement)
+
+
+def handle_error(exception_context):
+    # La sentencia falló: after_cursor_execute no se ejecuta
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started"):
+        connection.info["query_started"].pop()
+
+
+def setup_instrumentation(app):
+    if not env_flag("INSTRUMENTATION", "1"):
+        return None
+
+    metrics = Metrics()
+
+    # Todos los motores: también el async de asgi.py (fuera de una petición
+    # Flask solo se aplica el registro de consultas lentas)
+    if not event.contains(Engine, "before_cursor_execute", before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+        event.listen(Engine, "handle_error", handle_error)
+
+    # El tiempo de JSON se mide en el proveedor que tenga la app
+    dumps = app.json.dumps
+
+    def timed_dumps(obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return dumps(obj, **kwargs)
+        finally:
+            stats = current_stats()
+            if stats is not None:
+                stats.json_seconds += time.perf_counter() - started
+
+    app.json.dumps = timed_dumps
+
+    @app.before_request
+    def start_request_stats():
+        g.request_stats = RequestStats()
+
+    @app.after_request
+    def send_request_stats(response):
+        stats = g.pop("request_stats", None)
+        if stats is None:
+            return response
+        total = time.perf_counter() - stats.started
+        response.headers["Server-Timing"] = 'db;dur=%.1f;desc="%d queries", json;dur=%.1f, total;dur=%.1f' % (
+            stats.db_seconds * 1000, stats.queries, stats.json_seconds * 1000, total * 1000)
+        size = None if response.is_streamed else response.calculate_content_length()
+        metrics.record(request.endpoint or "unmatched", request.method, response.status_code,
+                       stats, total, size)
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    @internal_only
+    def get_metrics():
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+    return metrics
@@ -0,0 +1,48 @@
+"""
+JSON provider for the Flask app, chosen with the JSON_PROVIDER environment
+variable:
+
+    orjson    orjson encoder/decoder (default; falls back to Flask's when
+              orjson is not installed)
+    default   Flask's DefaultJSONProvider (stdlib json)
+
+Output matches the default provider (sorted keys, dates as HTTP dates,
+indented in debug mode) except that non-ASCII characters are written as
+UTF-8 instead of \\u escapes.
+"""
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    def __init__(self, app):
+        super().__init__(app)
+        import orjson
+        self.orjson = orjson
+
+    def dumps(self, obj, **kwargs):
+        option = self.orjson.OPT_NON_STR_KEYS | self.orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get("sort_keys", self.sort_keys):
+            option |= self.orjson.OPT_SORT_KEYS
+        if kwargs.get("indent"):
+            option |= self.orjson.OPT_INDENT_2
+        return self.orjson.dumps(obj, default=kwargs.get("default", self.default), option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return self.orjson.loads(s)
+
+
+def json_provider_from_env(app):
+    """
+    Builds the provider selected by JSON_PROVIDER (orjson or default).
+    """
+    provider = os.getenv("JSON_PROVIDER", "orjson")
+    if provider == "orjson":
+        try:
+            return OrjsonProvider(app)
+        except ImportError:
+            return DefaultJSONProvider(app)
+    if provider == "default":
+        return DefaultJSONProvider(app)
+    raise ValueError("Unknown JSON_PROVIDER: %s" % provider)
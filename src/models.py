@@ -1,6 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import String, ForeignKey
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from collections import Counter
+
+from sqlalchemy import DDL, Index, String, ForeignKey, bindparam, delete, event, func, insert, select, text, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Mapped, mapped_column, relationship, selectinload, joinedload, load_only, raiseload
 
 db = SQLAlchemy()
 
@@ -10,19 +16,26 @@ class User(db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
     password = db.Column(db.String(255), nullable=False)
     
-    profile = db.relationship("Profile", back_populates="user", uselist=False, cascade="all, delete-orphan")
-    favorites = db.relationship("Favorite", back_populates="user_fav", cascade="all, delete-orphan")  # ✅ Relación con favoritos
+    # passive_deletes: al borrar el usuario la BD elimina profile y favoritos
+    # (ON DELETE CASCADE) sin que el ORM los cargue
+    profile = db.relationship("Profile", back_populates="user", uselist=False, cascade="all, delete-orphan",
+                              passive_deletes=True)
+    favorites = db.relationship("Favorite", back_populates="user_fav", cascade="all, delete-orphan",
+                                passive_deletes=True)  # ✅ Relación con favoritos
 
-    def serialize(self):
-        data = {
-            "id": self.id,
-            "email": self.email,
-        }
+    def serialize(self, fields=None, expand=None):
+        # Por defecto todos los campos y relaciones (ver USER_FIELDS y USER_EXPANSIONS)
+        fields = USER_FIELDS if fields is None else fields
+        expand = USER_EXPANSIONS if expand is None else expand
+        data = {field: getattr(self, field) for field in fields}
 
         # Agregar profile solo si existe
-        if self.profile:
+        if "profile" in expand and self.profile:
             data["profile"] = self.profile.serialize()
 
+        if "favorites" not in expand:
+            return data
+
         # Filtrar favoritos y agregar solo si hay datos
         favorite_people = [fav.people.serialize() for fav in self.favorites if fav.people]
         favorite_planets = [fav.planet.serialize() for fav in self.favorites if fav.planet]
@@ -39,7 +52,7 @@ class Profile(db.Model):
     __tablename__ = "profiles"
     id = db.Column(db.Integer, primary_key=True)
     bio = db.Column(db.String(250))
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"))
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"))
     user = db.relationship("User", back_populates="profile")
 
     def serialize(self):
@@ -53,18 +66,26 @@ class Profile(db.Model):
 
 class People(db.Model):
     __tablename__ = "people"
+    # El ranking recorre este índice de mayor a menor
+    __table_args__ = (Index("ix_people_favorite_count_id", "favorite_count", "id"),)
     id: Mapped[int] = mapped_column(primary_key=True)
-    name: Mapped[str] = mapped_column(String(120), nullable=False)
-    favorites: Mapped[list["Favorite"]] = relationship(back_populates="people")  # ✅ Relación inversa
+    name: Mapped[str] = mapped_column(String(120), nullable=False, unique=True, index=True)
+    # Favoritos que apuntan a esta fila, mantenido por update_favorite_counts
+    favorite_count: Mapped[int] = mapped_column(nullable=False, default=0, server_default=text("0"))
+    favorites: Mapped[list["Favorite"]] = relationship(back_populates="people", passive_deletes="all")  # ✅ Relación inversa
 
     def serialize(self):
         return {"id": self.id, "name": self.name}
 
 class Planet(db.Model):
     __tablename__ = "planets"
+    # El ranking recorre este índice de mayor a menor
+    __table_args__ = (Index("ix_planets_favorite_count_id", "favorite_count", "id"),)
     id: Mapped[int] = mapped_column(primary_key=True)
-    name: Mapped[str] = mapped_column(String(120), nullable=False)
-    favorites: Mapped[list["Favorite"]] = relationship(back_populates="planet")  # ✅ Relación inversa
+    name: Mapped[str] = mapped_column(String(120), nullable=False, unique=True, index=True)
+    # Favoritos que apuntan a esta fila, mantenido por update_favorite_counts
+    favorite_count: Mapped[int] = mapped_column(nullable=False, default=0, server_default=text("0"))
+    favorites: Mapped[list["Favorite"]] = relationship(back_populates="planet", passive_deletes="all")  # ✅ Relación inversa
 
     def serialize(self):
         return {"id": self.id, "name": self.name}
@@ -74,10 +95,26 @@ class Planet(db.Model):
 
 class Favorite(db.Model):
     __tablename__ = "favorites"
+    __table_args__ = (
+        db.Index("ix_favorites_user_id_planet_id", "user_id", "planet_id"),
+        # Índice cubriente de los favoritos de un usuario (también sirve a
+        # las búsquedas por (user_id, people_id))
+        db.Index("ix_favorites_user_id_people_id_planet_id", "user_id", "people_id", "planet_id"),
+        # Búsquedas inversas (borrados en cascada de people/planets)
+        db.Index("ix_favorites_planet_id", "planet_id"),
+        db.Index("ix_favorites_people_id", "people_id"),
+        # Un usuario no puede repetir el mismo favorito
+        db.Index("uq_favorites_user_id_planet_id", "user_id", "planet_id", unique=True,
+                 postgresql_where=text("planet_id IS NOT NULL"),
+                 sqlite_where=text("planet_id IS NOT NULL")),
+        db.Index("uq_favorites_user_id_people_id", "user_id", "people_id", unique=True,
+                 postgresql_where=text("people_id IS NOT NULL"),
+                 sqlite_where=text("people_id IS NOT NULL")),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
-    people_id = db.Column(db.Integer, db.ForeignKey("people.id"), nullable=True)
-    planet_id = db.Column(db.Integer, db.ForeignKey("planets.id"), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    people_id = db.Column(db.Integer, db.ForeignKey("people.id", ondelete="CASCADE"), nullable=True)
+    planet_id = db.Column(db.Integer, db.ForeignKey("planets.id", ondelete="CASCADE"), nullable=True)
 
 
 
@@ -92,4 +129,169 @@ class Favorite(db.Model):
             "user_id": self.user_id,
             "people": self.people.serialize() if self.people else None,  # ✅ Solo si existe
             "planet": self.planet.serialize() if self.planet else None   # 
-        }
\ No newline at end of file
+        }
+
+
+# Estrategias de carga por forma de respuesta: cada listado ejecuta un número
+# fijo de consultas sin importar cuántas filas devuelva (evita N+1)
+FAVORITE_LOAD = (joinedload(Favorite.people), joinedload(Favorite.planet))
+
+USER_FAVORITES_LOAD = (selectinload(User.favorites).options(*FAVORITE_LOAD),)
+
+USER_LOAD = (selectinload(User.profile),) + USER_FAVORITES_LOAD
+
+# Campos y relaciones que los clientes pueden pedir con ?fields= y ?expand=
+USER_FIELDS = ("id", "email")
+USER_EXPANSIONS = ("profile", "favorites")
+
+def user_load_options(expand):
+    """
+    Loader options for User with only the relationships in expand: the
+    profile (one-to-one) comes in the same query through a JOIN, favorites
+    in one extra query. Anything not expanded raises instead of lazy loading.
+    """
+    options = [load_only(User.id, User.email)]
+    if "profile" in expand:
+        options.append(joinedload(User.profile))
+    if "favorites" in expand:
+        options.extend(USER_FAVORITES_LOAD)
+    options.append(raiseload("*"))
+    return options
+
+# Columnas que usan People.serialize y Planet.serialize: los listados pueden
+# leerlas como tuplas y serializarlas sin construir objetos ORM
+PEOPLE_COLUMNS = (People.id, People.name)
+PLANET_COLUMNS = (Planet.id, Planet.name)
+
+def serialize_row(row):
+    return row._asdict()
+
+# Columnas del ranking de favoritos
+PEOPLE_LEADERBOARD_COLUMNS = PEOPLE_COLUMNS + (People.favorite_count,)
+PLANET_LEADERBOARD_COLUMNS = PLANET_COLUMNS + (Planet.favorite_count,)
+
+def update_favorite_counts(favorites, delta):
+    """
+    Adds delta to favorite_count of every person and planet referenced by
+    favorites, an iterable of (people_id, planet_id) pairs, inside the
+    current transaction. The increment happens in the UPDATE itself, so
+    concurrent writers never lose counts; one executemany per table.
+    """
+    counts = {People: Counter(), Planet: Counter()}
+    for people_id, planet_id in favorites:
+        if people_id is not None:
+            counts[People][people_id] += delta
+        if planet_id is not None:
+            counts[Planet][planet_id] += delta
+
+    for model, changes in counts.items():
+        if changes:
+            table = model.__table__
+            db.session.execute(
+                update(table).where(table.c.id == bindparam("target_id"))
+                .values(favorite_count=table.c.favorite_count + bindparam("delta")),
+                [{"target_id": target_id, "delta": change} for target_id, change in changes.items()])
+
+def subtract_favorite_counts(condition):
+    """
+    Subtracts from favorite_count the favorites matching condition (a WHERE
+    clause on Favorite) that are about to be deleted in cascade, without
+    reading them: the rows are locked (FOR UPDATE) so no other request can
+    delete them in between, then one UPDATE ... FROM a GROUP BY per table
+    subtracts them, however many there are.
+    """
+    locked = select(Favorite.id).where(condition).with_for_update().subquery()
+    db.session.execute(select(func.count()).select_from(locked))
+    for model, column in ((People, Favorite.people_id), (Planet, Favorite.planet_id)):
+        removed = (select(column.label("target_id"), func.count().label("removed"))
+                   .where(condition, column.is_not(None)).group_by(column).subquery())
+        db.session.execute(
+            update(model).where(model.id == removed.c.target_id)
+            .values(favorite_count=model.favorite_count - removed.c.removed)
+            .execution_options(synchronize_session=False))
+
+def delete_favorites(condition):
+    """
+    Deletes the favorites matching condition (a WHERE clause on Favorite)
+    and subtracts them from favorite_count. Only the rows this DELETE
+    removed (RETURNING) are subtracted, so a favorite deleted at the same
+    time by another request is never counted twice. Returns the deleted
+    rows as (id, user_id, people_id, planet_id).
+    """
+    removed = db.session.execute(
+        delete(Favorite).where(condition)
+        .returning(Favorite.id, Favorite.user_id, Favorite.people_id, Favorite.planet_id)).all()
+    update_favorite_counts([(row.people_id, row.planet_id) for row in removed], -1)
+    return removed
+
+# INSERT ... ON CONFLICT DO NOTHING por dialecto (sqlite >= 3.24 y postgresql)
+UPSERT_INSERTS = {"postgresql": postgresql_insert, "sqlite": sqlite_insert}
+
+
+def upsert_favorite(user_id, people_id=None, planet_id=None):
+    """
+    Adds the favorite unless the user already has it, in a single INSERT
+    that skips the row on a conflict with the partial unique index. Returns
+    the new favorite id, or None when it already existed. A missing user or
+    target raises IntegrityError (foreign key).
+    """
+    column = Favorite.people_id if people_id is not None else Favorite.planet_id
+    values = {"user_id": user_id, "people_id": people_id, "planet_id": planet_id}
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect not in UPSERT_INSERTS:
+        # Sin ON CONFLICT (mysql): el duplicado se detecta al fallar el
+        # índice único, y sin RETURNING el id sale de inserted_primary_key
+        try:
+            with db.session.begin_nested():
+                return db.session.execute(insert(Favorite).values(values)).inserted_primary_key[0]
+        except IntegrityError:
+            if db.session.scalar(select(Favorite.id).filter_by(user_id=user_id, **{column.key: values[column.key]})):
+                return None
+            raise
+
+    statement = (UPSERT_INSERTS[dialect](Favorite).values(values)
+                 .on_conflict_do_nothing(index_elements=[Favorite.user_id, column],
+                                         index_where=column.isnot(None))
+                 .returning(Favorite.id))
+    return db.session.execute(statement).scalar()
+
+# Índices de búsqueda por nombre (ver search.py). No se pueden declarar como
+# Index del modelo, así que se crean con SQL propio junto a cada tabla; la
+# migración a48f1c2b9e07 hace lo mismo en bases existentes.
+#   postgresql: índice GIN de trigramas (pg_trgm) para ILIKE
+#   sqlite: índice NOCASE para prefijos y tabla FTS5 sincronizada por triggers
+SEARCH_DDL = {
+    "postgresql": [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX ix_%(table)s_name_trgm ON %(table)s USING gin (name gin_trgm_ops)",
+    ],
+    "sqlite": [
+        "CREATE INDEX ix_%(table)s_name_nocase ON %(table)s (name COLLATE NOCASE)",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS %(table)s_fts USING fts5(name, content='%(table)s', "
+        "content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        "CREATE TRIGGER %(table)s_fts_insert AFTER INSERT ON %(table)s BEGIN "
+        "INSERT INTO %(table)s_fts(rowid, name) VALUES (new.id, new.name); END",
+        "CREATE TRIGGER %(table)s_fts_delete AFTER DELETE ON %(table)s BEGIN "
+        "INSERT INTO %(table)s_fts(%(table)s_fts, rowid, name) VALUES ('delete', old.id, old.name); END",
+        "CREATE TRIGGER %(table)s_fts_update AFTER UPDATE OF name ON %(table)s BEGIN "
+        "INSERT INTO %(table)s_fts(%(table)s_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+        "INSERT INTO %(table)s_fts(rowid, name) VALUES (new.id, new.name); END",
+    ],
+}
+
+for table in (People.__table__, Planet.__table__):
+    for dialect, statements in SEARCH_DDL.items():
+        for statement in statements:
+            event.listen(table, "after_create", DDL(statement).execute_if(dialect=dialect))
+    event.listen(table, "before_drop", DDL("DROP TABLE IF EXISTS %(table)s_fts").execute_if(dialect="sqlite"))
+
+# SQLite solo aplica las claves foráneas, y con ellas ON DELETE CASCADE, si
+# se activan en cada conexión (también en la async de asgi.py)
+@event.listens_for(Engine, "connect")
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    if "sqlite" in type(dbapi_connection).__module__:
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
@@ -0,0 +1,122 @@
+"""
+Password hashing with scrypt (hashlib, no extra dependency). Hashes are
+stored as
+
+    scrypt$<n>$<r>$<p>$<salt>$<hash>      (salt and hash in base64)
+
+so each one keeps the cost it was made with. Hashing and verifying run in a
+bounded thread pool: hashlib releases the GIL while scrypt runs, so other
+threads keep serving requests, and at most PASSWORD_HASH_WORKERS hashes
+(each using 128 * n * r bytes of memory) run at the same time per process.
+
+    PASSWORD_SCRYPT_N        CPU/memory cost, a power of two (16384)
+    PASSWORD_SCRYPT_R        block size (8)
+    PASSWORD_SCRYPT_P        parallelization (1)
+    PASSWORD_HASH_WORKERS    threads hashing at once (2)
+
+Rows written before hashing existed hold the plain password; they still
+verify, and needs_rehash() tells the caller to store a hash instead, as it
+does for hashes made with a different cost. A value starting with
+"scrypt$" that does not parse is a broken hash, not a password, and never
+verifies.
+"""
+import base64
+import hashlib
+import hmac
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+
+PREFIX = "scrypt"
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+
+def b64encode(data):
+    return base64.b64encode(data).decode().rstrip("=")
+
+
+def b64decode(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def scrypt(password, salt, n, r, p):
+    # maxmem: lo que necesita scrypt con estos parámetros, más margen
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=128 * r * (n + p + 2) + 1024 * 1024, dklen=KEY_BYTES)
+
+
+def parse_hash(stored):
+    """
+    (n, r, p, salt, key) of a stored scrypt hash, or None for anything else
+    (a legacy plain text password).
+    """
+    parts = stored.split("$")
+    if len(parts) != 6 or parts[0] != PREFIX:
+        return None
+    try:
+        n, r, p = (int(part) for part in parts[1:4])
+        return n, r, p, b64decode(parts[4]), b64decode(parts[5])
+    except ValueError:
+        return None
+
+
+class PasswordHasher:
+    def __init__(self, n=2 ** 14, r=8, p=1, workers=2):
+        if n < 2 or n & (n - 1):
+            raise ValueError("scrypt n must be a power of two greater than 1: %s" % n)
+        self.n = n
+        self.r = r
+        self.p = p
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+
+    def _hash(self, password):
+        salt = os.urandom(SALT_BYTES)
+        key = scrypt(password, salt, self.n, self.r, self.p)
+        return "$".join((PREFIX, str(self.n), str(self.r), str(self.p), b64encode(salt), b64encode(key)))
+
+    def _verify(self, stored, password):
+        parsed = parse_hash(stored)
+        if parsed is None:
+            # Texto plano solo si no parece un hash: uno mal formado no
+            # se compara como contraseña
+            if stored.startswith(PREFIX + "$"):
+                return False
+            return hmac.compare_digest(stored.encode(), password.encode())
+        n, r, p, salt, key = parsed
+        try:
+            return hmac.compare_digest(scrypt(password, salt, n, r, p), key)
+        except ValueError:
+            # Parámetros que scrypt no acepta (n no potencia de dos...)
+            return False
+
+    def hash(self, password):
+        return self.executor.submit(self._hash, password).result()
+
+    def verify(self, stored, password):
+        """
+        True when password matches the stored hash (or legacy plain text).
+        """
+        return self.executor.submit(self._verify, stored, password).result()
+
+    @cached_property
+    def dummy_hash(self):
+        """
+        Hash of a random password with the current cost, to verify against
+        when the user does not exist: the response takes as long as for a
+        wrong password and does not tell which emails are registered.
+        """
+        return self.hash(b64encode(os.urandom(SALT_BYTES)))
+
+    def needs_rehash(self, stored):
+        parsed = parse_hash(stored)
+        return parsed is None or parsed[:3] != (self.n, self.r, self.p)
+
+
+def password_hasher_from_env():
+    return PasswordHasher(
+        n=int(os.getenv("PASSWORD_SCRYPT_N", 2 ** 14)),
+        r=int(os.getenv("PASSWORD_SCRYPT_R", 8)),
+        p=int(os.getenv("PASSWORD_SCRYPT_P", 1)),
+        workers=int(os.getenv("PASSWORD_HASH_WORKERS", 2)),
+    )
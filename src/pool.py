@@ -0,0 +1,112 @@
+"""
+Connection pool settings for the SQLAlchemy engine, read from environment
+variables, and live pool metrics.
+
+    DB_POOL_SIZE              connections kept open per worker
+    DB_MAX_OVERFLOW           extra connections allowed under load
+    DB_POOL_TIMEOUT           seconds to wait for a free connection
+    DB_POOL_RECYCLE           seconds before a connection is replaced (1800)
+    DB_POOL_PRE_PING          test connections before use (1)
+    DB_STATEMENT_TIMEOUT_MS   per statement timeout, Postgres only
+"""
+import os
+import threading
+import time
+
+from sqlalchemy.pool import QueuePool
+
+
+class PoolStats:
+    def __init__(self):
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, timed_out=False):
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "checkout_attempts": self.waits,
+                "wait_seconds_total": round(self.wait_seconds, 6),
+                "wait_seconds_max": round(self.max_wait_seconds, 6),
+                "wait_seconds_avg": round(self.wait_seconds / self.waits, 6) if self.waits else 0.0,
+                "timeouts": self.timeouts,
+            }
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that records how long each checkout waited for a connection.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            self.stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - started)
+        return connection
+
+
+def env_flag(name, default):
+    return os.getenv(name, default).lower() in ("1", "true", "yes", "on")
+
+
+def engine_options_from_env(database_uri):
+    options = {
+        "pool_pre_ping": env_flag("DB_POOL_PRE_PING", "1"),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+    }
+
+    # SQLite usa su propio pool; el dimensionado solo aplica a servidores
+    if database_uri.startswith("sqlite"):
+        return options
+
+    options["poolclass"] = TimedQueuePool
+    for option, name in (("pool_size", "DB_POOL_SIZE"),
+                         ("max_overflow", "DB_MAX_OVERFLOW"),
+                         ("pool_timeout", "DB_POOL_TIMEOUT")):
+        if os.getenv(name):
+            options[option] = int(os.getenv(name))
+
+    statement_timeout = os.getenv("DB_STATEMENT_TIMEOUT_MS")
+    if statement_timeout and database_uri.startswith("postgresql"):
+        options["connect_args"] = {"options": "-c statement_timeout=%d" % int(statement_timeout)}
+
+    return options
+
+
+def pool_metrics(engine):
+    pool = engine.pool
+    data = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        data.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": pool._max_overflow,
+        })
+    if isinstance(pool, TimedQueuePool):
+        data.update(pool.stats.to_dict())
+    return data
@@ -0,0 +1,82 @@
+"""
+Name search over people and planets, backed by the indexes in
+models.SEARCH_DDL:
+
+    postgresql  ILIKE filters on a pg_trgm GIN index, ranked by similarity()
+    sqlite      FTS5 prefix queries ranked by bm25(); prefixes use a NOCASE
+                index range
+    others      plain ILIKE filters, shorter names first
+
+Every word in the query must match (as a prefix on SQLite, anywhere in the
+name elsewhere). Prefix filters are case-insensitive; SQLite only folds
+ASCII letters.
+"""
+import re
+
+from sqlalchemy import and_, column, func, literal, literal_column, select, table, union_all
+
+from models import db, People, Planet
+
+SEARCH_COLLECTIONS = {"people": People, "planets": Planet}
+
+# Longitud máxima de q y de name_prefix
+MAX_QUERY_LENGTH = 100
+
+
+def dialect_name():
+    return db.session.get_bind().dialect.name
+
+
+def escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def name_prefix_filter(model, prefix, dialect=None):
+    # dialect: el del motor que ejecutará la consulta (por defecto, la sesión)
+    if (dialect or dialect_name()) == "sqlite":
+        # Rango sobre el índice (name COLLATE NOCASE): sin recorrer la tabla
+        name = model.name.collate("NOCASE")
+        return and_(name >= prefix, name <= prefix + "\U0010ffff")
+    return model.name.ilike(escape_like(prefix) + "%", escape="\\")
+
+
+def collection_query(collection, words, dialect):
+    """
+    (type, id, name, score) rows of one collection matching every word;
+    higher scores rank first.
+    """
+    model = SEARCH_COLLECTIONS[collection]
+    columns = (literal(collection).label("type"), model.id.label("id"), model.name.label("name"))
+
+    if dialect == "sqlite":
+        fts = table("%s_fts" % model.__tablename__, column("rowid"))
+        fts_name = literal_column(fts.name)
+        match = " ".join('"%s"*' % word for word in words)
+        return (select(*columns, (-func.bm25(fts_name)).label("score"))
+                .select_from(fts).join(model, model.id == fts.c.rowid)
+                .where(fts_name.match(match)))
+
+    query = select(*columns).where(*[model.name.ilike("%" + escape_like(word) + "%", escape="\\")
+                                     for word in words])
+    if dialect == "postgresql":
+        score = func.similarity(model.name, " ".join(words))
+    else:
+        score = -func.length(model.name)
+    return query.add_columns(score.label("score"))
+
+
+def search(q, collections, limit, offset):
+    """
+    Ranked page of matches across collections: returns (rows, has_more).
+    """
+    words = re.findall(r"\w+", q)
+    if not words or not collections:
+        return [], False
+
+    dialect = dialect_name()
+    queries = [collection_query(collection, words, dialect) for collection in collections]
+    query = union_all(*queries) if len(queries) > 1 else queries[0]
+    query = query.order_by(literal_column("score").desc(), literal_column("type"), literal_column("id"))
+
+    rows = db.session.execute(query.limit(limit + 1).offset(offset)).all()
+    return rows[:limit], len(rows) > limit
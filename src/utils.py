@@ -1,4 +1,16 @@
-from flask import jsonify, url_for
+import base64
+import hmac
+import json
+import os
+from functools import wraps
+from flask import jsonify, url_for, request
+
+# Tamaño de página por defecto y tope máximo para los listados paginados
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Máximo de elementos aceptados por una petición bulk
+MAX_BULK_ITEMS = 5000
 
 class APIException(Exception):
     status_code = 400
@@ -15,13 +27,168 @@ class APIException(Exception):
         rv['message'] = self.message
         return rv
 
+def internal_only(view):
+    """
+    Restricts a view to callers that send INTERNAL_TOKEN as a bearer token
+    (Authorization: Bearer <token>). Without INTERNAL_TOKEN the view
+    answers 404 to everyone.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = os.getenv("INTERNAL_TOKEN")
+        if not token:
+            raise APIException("Not found", status_code=404)
+        if not hmac.compare_digest(request.headers.get("Authorization", "").encode(),
+                                   ("Bearer %s" % token).encode()):
+            raise APIException("Unauthorized", status_code=401)
+        return view(*args, **kwargs)
+    return wrapper
+
+def encode_cursor(last_id):
+    # El cursor es opaco para el cliente: el último id servido en base64
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise APIException("Invalid cursor", status_code=400)
+
+def get_page_args(args=None):
+    if args is None:
+        args = request.args
+    limit = args.get("limit", DEFAULT_PAGE_SIZE)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise APIException("limit must be an integer", status_code=400)
+    if limit < 1:
+        raise APIException("limit must be greater than 0", status_code=400)
+
+    after = args.get("after")
+    if after:
+        after = decode_cursor(after)
+    else:
+        after = None
+
+    return min(limit, MAX_PAGE_SIZE), after
+
+def get_list_arg(name, allowed, args=None):
+    """
+    Reads a comma separated ?name= argument as a tuple, rejecting values not
+    in allowed. Returns allowed when the argument is absent.
+    """
+    if args is None:
+        args = request.args
+    value = args.get(name)
+    if value is None:
+        return tuple(allowed)
+
+    values = tuple(item.strip() for item in value.split(",") if item.strip())
+    unknown = [item for item in values if item not in allowed]
+    if unknown:
+        raise APIException("Unknown %s: %s" % (name, ", ".join(unknown)), status_code=400)
+    return values
+
+def paginate(query, column):
+    """
+    Keyset pagination over an integer primary key: reads ?limit= and ?after=
+    from the request and returns (rows, next_cursor). next_cursor is None on
+    the last page.
+    """
+    limit, after = get_page_args()
+    if after is not None:
+        query = query.filter(column > after)
+
+    # Pedimos una fila de más para saber si existe una página siguiente
+    rows = query.order_by(column).limit(limit + 1).all()
+    return split_page(rows, limit)
+
+def split_page(rows, limit):
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1].id)
+    return rows, None
+
+def page_response(items, next_cursor):
+    return {"results": items, "next_cursor": next_cursor}
+
+def get_ids_arg(args=None):
+    """
+    Reads ?ids=1,2,3 as a list of ids in the requested order, without
+    repeats. Returns None when the argument is absent.
+    """
+    if args is None:
+        args = request.args
+    value = args.get("ids")
+    if value is None:
+        return None
+
+    ids = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            item_id = int(item)
+        except ValueError:
+            raise APIException("ids must be a comma separated list of integers", status_code=400)
+        if item_id not in ids:
+            ids.append(item_id)
+    if len(ids) > MAX_PAGE_SIZE:
+        raise APIException("Too many ids, the maximum is %d" % MAX_PAGE_SIZE, status_code=400)
+    return ids
+
+def ids_response(items_by_id, ids):
+    # En el orden pedido, con los ids que no existen aparte
+    return {
+        "results": [items_by_id[item_id] for item_id in ids if item_id in items_by_id],
+        "missing": [item_id for item_id in ids if item_id not in items_by_id],
+    }
+
+def get_bulk_items():
+    """
+    Reads the items of a bulk request: a JSON array, or one JSON value per
+    line when the body is sent as application/x-ndjson.
+    """
+    if request.mimetype == "application/x-ndjson":
+        items = []
+        for number, line in enumerate(request.stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                raise APIException("Invalid JSON on line %d" % number, status_code=400)
+            if len(items) > MAX_BULK_ITEMS:
+                break
+    else:
+        items = request.get_json(silent=True)
+        if not isinstance(items, list):
+            raise APIException("Expected a JSON array of items", status_code=400)
+
+    if not items:
+        raise APIException("No items to process", status_code=400)
+    if len(items) > MAX_BULK_ITEMS:
+        raise APIException("Too many items, the maximum is %d" % MAX_BULK_ITEMS, status_code=413)
+    return items
+
+def bulk_error(index, message):
+    return {"index": index, "status": "error", "error": message}
+
+def bulk_response(results):
+    errors = sum(1 for result in results if result["status"] == "error")
+    return {"processed": len(results) - errors, "errors": errors, "results": results}
+
 def has_no_empty_params(rule):
     defaults = rule.defaults if rule.defaults is not None else ()
     arguments = rule.arguments if rule.arguments is not None else ()
     return len(defaults) >= len(arguments)
 
 def generate_sitemap(app):
-    links = ['/admin/']
+    links = ['/admin/'] if "admin" in app.blueprints else []
     for rule in app.url_map.iter_rules():
         # Filter out rules we can't navigate to in a browser
         # and rules that require parameters
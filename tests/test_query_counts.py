@@ -0,0 +1,76 @@
+"""
+The user routes must run a fixed number of SQL statements per request, no
+matter how many rows the tables hold: a loop that queries per user or per
+favorite (N+1) shows up as a count that grows with the data, and an extra
+query per request as a count above the expected one.
+
+    python -m pytest tests/test_query_counts.py
+"""
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine, event, insert
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+sys.path.insert(0, os.path.join(HERE, "..", "benchmarks"))
+
+# Sin caché de respuestas: cada petición llega a la base de datos
+os.environ["CACHE_BACKEND"] = "none"
+os.environ.setdefault("INSTRUMENTATION", "0")
+
+from seed import seed
+from models import Favorite
+
+# Con el tamaño máximo de página todas las filas entran en la respuesta,
+# así que un N+1 hace crecer la cuenta con ROWS
+ROWS = 10
+# Sentencias por petición: usuarios y sus relaciones en una consulta cada uno
+EXPECTED_STATEMENTS = {
+    "/users?limit=200": 2,
+    "/users/1": 2,
+    "/users/favorites?limit=200": 2,
+}
+
+
+def count_statements(url, path):
+    os.environ["DATABASE_URL"] = url
+    from app import create_app
+    from models import db
+
+    app = create_app(admin=False, migrate=False)
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        response = app.test_client().get(path)
+        db.engine.dispose()
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return len(statements)
+
+
+def add_favorites_of_user_1(url, rows):
+    # El seed da al usuario 1 los mismos favoritos con cualquier tamaño
+    # (person 1 y planet 2): aquí los suyos crecen con rows
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(insert(Favorite), [{"user_id": 1, "people_id": i, "planet_id": None} for i in range(2, rows + 1)]
+                     + [{"user_id": 1, "people_id": None, "planet_id": i} for i in range(3, rows + 1)])
+    engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def database_urls(tmp_path_factory):
+    urls = []
+    for rows in (ROWS, ROWS * 10):
+        url = "sqlite:///%s" % tmp_path_factory.mktemp("db").joinpath("rows-%d.db" % rows)
+        seed(url, rows)
+        add_favorites_of_user_1(url, rows)
+        urls.append(url)
+    return urls
+
+
+@pytest.mark.parametrize("path", EXPECTED_STATEMENTS)
+def test_statement_count_does_not_grow_with_rows(database_urls, path):
+    small, large = (count_statements(url, path) for url in database_urls)
+    assert small == large == EXPECTED_STATEMENTS[path]